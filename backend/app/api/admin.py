@@ -0,0 +1,64 @@
+"""Admin routes for the egress model registry.
+
+Every route requires the ``X-Admin-Token`` header to match ``ADMIN_TOKEN``;
+with no token configured the routes answer 403.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import secrets
+from typing import Any
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+from pydantic import BaseModel
+
+from app.config import settings
+from app.ml.model_registry import list_model_versions, set_active_version
+from app.ml.predictor import activate_model_version, model_status, set_shadow_model_version
+
+
+def require_admin(x_admin_token: str | None = Header(None)) -> None:
+    if not settings.admin_token:
+        raise HTTPException(status_code=403, detail="Admin routes are disabled")
+    if x_admin_token is None or not secrets.compare_digest(x_admin_token, settings.admin_token):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+
+router = APIRouter(prefix="/admin", tags=["admin"], dependencies=[Depends(require_admin)])
+
+
+class ModelActivation(BaseModel):
+    version: str
+    shadow: bool = False
+
+
+@router.get("/model")
+async def get_model_status() -> dict[str, Any]:
+    return {**model_status(), "versions": list_model_versions()}
+
+
+@router.post("/model/activate")
+async def activate_model(request: ModelActivation) -> dict[str, Any]:
+    """Swap to (or shadow) a registry version once it has loaded and warmed up.
+
+    A promoted version is also written to the registry's ACTIVE file so other
+    workers pick it up and restarts keep serving it.
+    """
+    try:
+        if request.shadow:
+            await asyncio.to_thread(set_shadow_model_version, request.version)
+        else:
+            await asyncio.to_thread(activate_model_version, request.version)
+            set_active_version(request.version)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown model version: {request.version}")
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+    return model_status()
+
+
+@router.delete("/model/shadow")
+async def stop_shadow_model() -> dict[str, Any]:
+    set_shadow_model_version(None)
+    return model_status()
@@ -0,0 +1,199 @@
+"""Shared-clock scenario playback.
+
+A playback session owns one scenario clock. It advances a minute every
+``60 / speed`` seconds, serializes that minute's frame once, and fans the
+result out to every subscriber (SSE or WebSocket). Each subscriber has a small
+bounded queue; a consumer that falls behind loses its oldest queued frames
+instead of slowing the clock or growing memory.
+
+A session is dropped from the registry once its clock has finished and its
+last subscriber has left.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import uuid
+from typing import Any, Callable
+
+from pydantic import BaseModel, Field
+
+from app.api.timeline import TIMELINE_MINUTES
+from app.api.timeline_cache import dump_json
+
+log = logging.getLogger(__name__)
+
+SUBSCRIBER_QUEUE_SIZE = 16
+
+
+class PlaybackRequest(BaseModel):
+    scenario_id: str
+    speed: float = Field(1.0, gt=0, le=3600, description="Scenario minutes per real minute.")
+    start_minute: int = Field(0, ge=0, lt=TIMELINE_MINUTES)
+    loop: bool = False
+
+
+class Subscriber:
+    """Bounded per-client queue. ``None`` marks the end of the session."""
+
+    def __init__(self, maxsize: int = SUBSCRIBER_QUEUE_SIZE) -> None:
+        self._queue: asyncio.Queue[str | None] = asyncio.Queue(maxsize=maxsize)
+        self.dropped = 0
+
+    def offer(self, message: str | None) -> None:
+        if self._queue.full():
+            self._queue.get_nowait()
+            self.dropped += 1
+        self._queue.put_nowait(message)
+
+    async def get(self) -> str | None:
+        return await self._queue.get()
+
+
+class PlaybackSession:
+    def __init__(
+        self,
+        session_id: str,
+        scenario_id: str,
+        frames: list[dict[str, Any]],
+        speed: float,
+        start_minute: int,
+        loop: bool,
+        on_idle: Callable[[PlaybackSession], None] | None = None,
+    ) -> None:
+        self.session_id = session_id
+        self.scenario_id = scenario_id
+        self.speed = speed
+        self.loop = loop
+        self._frames = frames
+        self._index = start_minute
+        self.minute = start_minute
+        self._current: str | None = None
+        self._subscribers: set[Subscriber] = set()
+        self._task: asyncio.Task[None] | None = None
+        self._on_idle = on_idle
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run(), name=f"playback-{self.session_id}")
+        self._task.add_done_callback(lambda _: self._notify_idle())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def subscribe(self) -> Subscriber:
+        subscriber = Subscriber()
+        # Late joiners start on the frame everyone else is showing.
+        if self._current is not None:
+            subscriber.offer(self._current)
+        if not self.running and self._task is not None:
+            subscriber.offer(None)
+        self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        self._subscribers.discard(subscriber)
+        if subscriber.dropped:
+            log.info(
+                "Playback %s subscriber left after dropping %d frames",
+                self.session_id,
+                subscriber.dropped,
+            )
+        self._notify_idle()
+
+    def _notify_idle(self) -> None:
+        """Report a finished clock with nobody left watching it."""
+        if self._on_idle is not None and self._task is not None and self._task.done() and not self._subscribers:
+            self._on_idle(self)
+
+    def describe(self) -> dict[str, Any]:
+        return {
+            "session_id": self.session_id,
+            "scenario_id": self.scenario_id,
+            "speed": self.speed,
+            "loop": self.loop,
+            "minute": self.minute,
+            "running": self.running,
+            "subscribers": len(self._subscribers),
+        }
+
+    def _publish(self, minute: int, message: str) -> None:
+        self.minute = minute
+        self._current = message
+        for subscriber in self._subscribers:
+            subscriber.offer(message)
+
+    async def _run(self) -> None:
+        interval = 60.0 / self.speed
+        clock = asyncio.get_running_loop()
+        next_tick = clock.time()
+        try:
+            while self._frames:
+                frame = self._frames[self._index]
+                self._publish(frame["minute"], dump_json(frame).decode("utf-8"))
+                if self._index + 1 >= len(self._frames):
+                    if not self.loop:
+                        break
+                    self._index = 0
+                else:
+                    self._index += 1
+                # Schedule against the session start so ticks do not drift.
+                next_tick += interval
+                await asyncio.sleep(max(0.0, next_tick - clock.time()))
+        finally:
+            for subscriber in self._subscribers:
+                subscriber.offer(None)
+
+
+class PlaybackRegistry:
+    def __init__(self) -> None:
+        self._sessions: dict[str, PlaybackSession] = {}
+
+    def create(
+        self,
+        scenario_id: str,
+        frames: list[dict[str, Any]],
+        speed: float,
+        start_minute: int,
+        loop: bool,
+    ) -> PlaybackSession:
+        session = PlaybackSession(
+            uuid.uuid4().hex[:12], scenario_id, frames, speed, start_minute, loop, on_idle=self._evict
+        )
+        self._sessions[session.session_id] = session
+        session.start()
+        return session
+
+    def _evict(self, session: PlaybackSession) -> None:
+        if self._sessions.get(session.session_id) is session:
+            del self._sessions[session.session_id]
+            log.info("Playback %s finished; removed from registry", session.session_id)
+
+    def get(self, session_id: str) -> PlaybackSession | None:
+        return self._sessions.get(session_id)
+
+    def list(self) -> list[PlaybackSession]:
+        return list(self._sessions.values())
+
+    async def stop(self, session_id: str) -> bool:
+        session = self._sessions.pop(session_id, None)
+        if session is None:
+            return False
+        await session.stop()
+        return True
+
+    async def shutdown(self) -> None:
+        for session_id in list(self._sessions):
+            await self.stop(session_id)
+
+
+playback_sessions = PlaybackRegistry()
@@ -1,17 +1,42 @@
 from __future__ import annotations
 
+import asyncio
 import json
-from collections import defaultdict
 from pathlib import Path
-from typing import Any
+from typing import Any, Literal
 
-from fastapi import APIRouter, Depends, HTTPException
+from collections.abc import AsyncIterator
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.models import Predictions, RoutingDecisions, TransitCache
-from app.db.session import get_db_session
+from app.api.playback import PlaybackRequest, PlaybackSession, playback_sessions
+from app.api.scenario_pack import load_scenario_pack
+from app.api.timeline import (
+    STREAM_CHUNK_MINUTES,
+    TIMELINE_MINUTES,
+    assemble_columnar,
+    assemble_frames,
+    fetch_timeline_rows,
+    frames_to_columnar,
+    generate_synthetic_timeline,
+    iter_timeline_frames,
+    parse_timeline_fields,
+    project_frame,
+    slice_columnar,
+)
+from app.api.timeline_cache import CompiledTimeline, dump_json, etag_matches, make_etag, timeline_cache
+from app.db.models import PrecomputeRuns
+from app.db.session import AsyncSessionLocal, get_db_session
 from app.etl.scenarios import get_scenario, get_scenarios
+from app.ml.simulation_engine import (
+    DEFAULT_QUANTILES,
+    SimulationConfig,
+    simulate_surge_envelope,
+    surge_envelope_frame,
+)
 
 router = APIRouter(tags=["scenarios"])
 
@@ -19,116 +44,6 @@ router = APIRouter(tags=["scenarios"])
 _DATA_DIR = Path(__file__).resolve().parents[2] / "data"
 _LINK_STATIONS_JSON = _DATA_DIR / "link_stations.json"
 _STADIUM_DEPARTURES_JSON = _DATA_DIR / "stadium_departures.json"
-CRITICAL_CAPACITY_THRESHOLD = 133
-EMERGENCY_CORRIDOR = [
-    [47.6044, -122.3238],
-    [47.6019, -122.3258],
-    [47.5994, -122.3282],
-    [47.5972, -122.3299],
-    [47.5952, -122.3316],
-]
-
-
-def minute_label(minute: int) -> str:
-    hour = minute // 60
-    mins = minute % 60
-    return f"{hour:02d}:{mins:02d}"
-
-
-def _parse_routes(routes: Any) -> list[list[list[float]]]:
-    if not routes:
-        return []
-    if isinstance(routes, str):
-        try:
-            routes = json.loads(routes)
-        except json.JSONDecodeError:
-            return []
-    if not isinstance(routes, list):
-        return []
-    normalized: list[list[list[float]]] = []
-    for route in routes:
-        path = route.get("path") if isinstance(route, dict) else route
-        if not isinstance(path, list):
-            continue
-        line: list[list[float]] = []
-        for point in path:
-            if (
-                isinstance(point, list)
-                and len(point) >= 2
-                and isinstance(point[0], (int, float))
-                and isinstance(point[1], (int, float))
-            ):
-                line.append([float(point[0]), float(point[1])])
-        if len(line) >= 2:
-            normalized.append(line)
-    return normalized
-
-
-def generate_synthetic_timeline(scenario_id: str, scenario: dict[str, Any]) -> list[dict[str, Any]]:
-    timeline: list[dict[str, Any]] = []
-    is_blowout = "blowout" in scenario_id.lower()
-    for minute in range(1440):
-        label = minute_label(minute)
-        threat = 0.12
-        game_state: dict[str, Any] | None = None
-        if 1080 <= minute < 1260:
-            game_state = {"home": 0, "away": 0, "clock": "15:00", "qtr": 1, "quarter": 1}
-            if is_blowout and minute >= 1125:
-                game_state = {"home": 14, "away": 42, "clock": "6:12", "qtr": 3, "quarter": 3}
-                threat = 0.95
-            elif minute >= 1200:
-                threat = 0.62
-            else:
-                threat = 0.35
-
-        surge = int(25 + threat * 170)
-        lock_down = surge >= int(CRITICAL_CAPACITY_THRESHOLD * 1.1) or threat >= 0.9
-        transit_status = {
-            "stadium_station": "LOCKED_DOWN" if lock_down else "OPEN",
-            "king_st": "OPEN",
-        }
-        emergency_corridors = [EMERGENCY_CORRIDOR] if lock_down else []
-
-        timeline.append(
-            {
-                "minute": minute,
-                "time_label": label,
-                "timestamp_label": label,
-                "transit_load": {},
-                "pedestrian_volume": {},
-                "egress_threat_score": round(threat, 3),
-                "threat_score": round(threat, 3),
-                "estimated_crowd_volume": int(threat * 68000),
-                "predicted_surge_velocity": surge,
-                "critical_capacity_threshold": CRITICAL_CAPACITY_THRESHOLD,
-                "platform_utilization_pct": int(round((surge / CRITICAL_CAPACITY_THRESHOLD) * 100)),
-                "game_state": game_state,
-                "danger_routes": [],
-                "safe_routes": [],
-                "emergency_corridors": emergency_corridors,
-                "transit_status": transit_status,
-                "ai_log_lines": (
-                    [
-                        "THREAT EXCEEDS PLATFORM LIMIT.",
-                        "EXECUTING STATION LOCKDOWN.",
-                        "MAPPING EMS CORRIDORS.",
-                    ]
-                    if lock_down
-                    else [
-                        "MONITORING CORRIDOR FLOW.",
-                        "CAPACITY WITHIN SAFE LIMITS.",
-                        "NO INTERVENTION REQUIRED.",
-                    ]
-                ),
-                "alert_message": (
-                    "CRITICAL: Surge velocity exceeds platform limit."
-                    if lock_down
-                    else "All systems normal."
-                ),
-                "severity": 5 if lock_down else 1,
-            }
-        )
-    return timeline
 
 
 @router.get("/scenarios")
@@ -155,95 +70,339 @@ async def get_link_stations() -> dict[str, Any]:
 
 @router.get("/scenarios/{scenario_id}/timeseries")
 async def get_scenario_timeseries(
-    scenario_id: str, db: AsyncSession = Depends(get_db_session)
+    scenario_id: str,
+    start: int = Query(0, ge=0, lt=TIMELINE_MINUTES, description="First minute (inclusive)."),
+    end: int = Query(TIMELINE_MINUTES, gt=0, le=TIMELINE_MINUTES, description="Last minute (exclusive)."),
+    fields: str | None = Query(None, description="Comma-separated frame keys to return."),
+    format: Literal["frames", "columnar"] = Query("frames", description="Response layout."),
+    if_none_match: str | None = Header(None),
+    db: AsyncSession = Depends(get_db_session),
+) -> Response:
+    scenario = get_scenario(scenario_id)
+    if scenario is None:
+        raise HTTPException(status_code=404, detail=f"Unknown scenario_id: {scenario_id}")
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be less than end")
+    projection = parse_timeline_fields(fields)
+
+    generation = await _current_generation(db)
+    if generation is None:
+        # Database predates generation stamps: nothing to key a cache on.
+        body = await _build_payload(db, scenario_id, scenario, start, end, projection, format, None)
+        return Response(content=dump_json(body), media_type="application/json")
+
+    etag = make_etag(generation, scenario_id, format, start, end, ",".join(projection or ()))
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    if start == 0 and end == TIMELINE_MINUTES and projection is None:
+        _, compiled = await _full_day_payload(db, scenario_id, scenario, format, generation)
+        return Response(
+            content=compiled.body(format),
+            media_type="application/json",
+            headers=headers,
+        )
+
+    if load_scenario_pack(scenario_id, generation) is not None:
+        # Windows are sliced straight out of the memory-mapped pack.
+        body = dump_json(
+            await _build_payload(db, scenario_id, scenario, start, end, projection, format, generation)
+        )
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    payload, _ = await _full_day_payload(db, scenario_id, scenario, format, generation)
+    if format == "columnar":
+        body = dump_json(
+            {
+                "scenario_id": scenario_id,
+                "metadata": scenario,
+                **slice_columnar(payload, start, end, projection),
+            }
+        )
+    else:
+        body = dump_json(
+            {
+                "scenario_id": scenario_id,
+                "metadata": scenario,
+                "timeline": [
+                    project_frame(frame, projection) for frame in payload["timeline"][start:end]
+                ],
+            }
+        )
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@router.get("/scenarios/{scenario_id}/timeseries/stream")
+async def stream_scenario_timeseries(
+    scenario_id: str,
+    start: int = Query(0, ge=0, lt=TIMELINE_MINUTES, description="First minute (inclusive)."),
+    end: int = Query(TIMELINE_MINUTES, gt=0, le=TIMELINE_MINUTES, description="Last minute (exclusive)."),
+    fields: str | None = Query(None, description="Comma-separated frame keys to return."),
+    format: Literal["ndjson", "sse"] = Query("ndjson", description="Stream encoding."),
+) -> StreamingResponse:
+    """Stream timeline frames as they are read, one NDJSON line or SSE event each."""
+    scenario = get_scenario(scenario_id)
+    if scenario is None:
+        raise HTTPException(status_code=404, detail=f"Unknown scenario_id: {scenario_id}")
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be less than end")
+    projection = parse_timeline_fields(fields)
+
+    async def body() -> AsyncIterator[bytes]:
+        # The session is owned by the generator so it stays open while streaming.
+        async with AsyncSessionLocal() as db:
+            async for frame in _stream_frames(db, scenario_id, scenario, start, end, projection):
+                if format == "sse":
+                    yield b"event: frame\ndata: " + dump_json(frame) + b"\n\n"
+                else:
+                    yield dump_json(frame) + b"\n"
+        if format == "sse":
+            yield b"event: end\ndata: {}\n\n"
+
+    media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+    return StreamingResponse(body(), media_type=media_type, headers={"Cache-Control": "no-cache"})
+
+
+async def _stream_frames(
+    db: AsyncSession,
+    scenario_id: str,
+    scenario: dict[str, Any],
+    start: int,
+    end: int,
+    projection: tuple[str, ...] | None,
+) -> AsyncIterator[dict[str, Any]]:
+    generation = await _current_generation(db)
+    pack = load_scenario_pack(scenario_id, generation) if generation is not None else None
+    if pack is None:
+        async for frame in iter_timeline_frames(db, scenario_id, scenario, start, end, projection):
+            yield frame
+        return
+    for chunk_start in range(start, end, STREAM_CHUNK_MINUTES):
+        for frame in pack.frames(chunk_start, min(end, chunk_start + STREAM_CHUNK_MINUTES), projection):
+            yield frame
+
+
+# Frame keys the surge simulation reads.
+_SURGE_INPUT_FIELDS = ("egress_threat_score", "estimated_crowd_volume", "game_state")
+
+
+@router.get("/scenarios/{scenario_id}/surge-envelope")
+async def get_surge_envelope(
+    scenario_id: str,
+    start: int = Query(0, ge=0, lt=TIMELINE_MINUTES, description="First minute (inclusive)."),
+    end: int = Query(TIMELINE_MINUTES, gt=0, le=TIMELINE_MINUTES, description="Last minute (exclusive)."),
+    mode: Literal["analytic", "sampled"] = Query("analytic", description="Closed form or Monte Carlo."),
+    num_simulations: int = Query(
+        10_000,
+        ge=100,
+        le=100_000,
+        description="Draws per minute (the cap with ci_tolerance). Non-random sampling "
+        "and ci_tolerance need at least 512: four independent replicates of 128.",
+    ),
+    quantiles: str | None = Query(
+        None,
+        description="Comma-separated percentiles in [0, 100] (default 50,90,95,99); "
+        "analytic mode excludes the unbounded p100.",
+    ),
+    sampling: Literal["random", "antithetic", "van_der_corput", "latin_hypercube"] = Query(
+        "random",
+        description="Draws for sampled mode (van_der_corput: randomly shifted 1-D quasi-Monte Carlo); "
+        "the non-random methods need ~10x fewer simulations.",
+    ),
+    ci_tolerance: float | None = Query(
+        None, gt=0, description="Stop sampling a minute once its p95 interval is this narrow (fans/minute)."
+    ),
+    db: AsyncSession = Depends(get_db_session),
 ) -> dict[str, Any]:
+    """Per-minute surge percentiles, mean and exceedance probability from one simulation.
+
+    Minutes include a confidence interval on p95 when it is requested.
+    """
     scenario = get_scenario(scenario_id)
     if scenario is None:
         raise HTTPException(status_code=404, detail=f"Unknown scenario_id: {scenario_id}")
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be less than end")
+    try:
+        percentiles = (
+            tuple(float(q) for q in quantiles.split(",") if q.strip()) if quantiles else DEFAULT_QUANTILES
+        )
+        config = SimulationConfig(
+            num_simulations=num_simulations,
+            mode=mode,
+            quantiles=percentiles,
+            sampling=sampling,
+            ci_tolerance=ci_tolerance,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
 
-    transit_result = await db.execute(
-        select(TransitCache).where(TransitCache.scenario_id == scenario_id)
-    )
-    prediction_result = await db.execute(
-        select(Predictions).where(Predictions.scenario_id == scenario_id)
+    # The surge model is anchored to the full day, so always simulate all of it.
+    rows = await fetch_timeline_rows(db, scenario_id, 0, TIMELINE_MINUTES, _SURGE_INPUT_FIELDS)
+    if rows is None:
+        frames = generate_synthetic_timeline(
+            scenario_id, scenario, 0, TIMELINE_MINUTES, _SURGE_INPUT_FIELDS
+        )
+    else:
+        frames = assemble_frames(rows, _SURGE_INPUT_FIELDS)
+    envelope = await asyncio.to_thread(simulate_surge_envelope, frames, config)
+
+    return {
+        "scenario_id": scenario_id,
+        "mode": mode,
+        "num_simulations": num_simulations if mode == "sampled" else None,
+        "sampling": sampling if mode == "sampled" else None,
+        "critical_capacity_threshold": config.critical_capacity_threshold,
+        "envelope": [
+            {"minute": minute, **surge_envelope_frame(envelope, minute)}
+            for minute in range(start, end)
+        ],
+    }
+
+
+async def _current_generation(db: AsyncSession) -> str | None:
+    """Return the stamp of the latest precompute run, if any."""
+    result = await db.execute(
+        select(PrecomputeRuns.generation).order_by(PrecomputeRuns.id.desc()).limit(1)
     )
-    routing_result = await db.execute(
-        select(RoutingDecisions).where(RoutingDecisions.scenario_id == scenario_id)
+    return result.scalar_one_or_none()
+
+
+async def _full_day_payload(
+    db: AsyncSession,
+    scenario_id: str,
+    scenario: dict[str, Any],
+    fmt: str,
+    generation: str | None,
+) -> tuple[dict[str, Any], CompiledTimeline | None]:
+    """Full-day payload, compiled once per precompute generation when stamped.
+
+    Also returns the cache entry holding it, so callers serialize from that
+    entry even if a request for a newer generation replaces it meanwhile.
+    """
+    if generation is None:
+        payload = await _build_payload(db, scenario_id, scenario, 0, TIMELINE_MINUTES, None, fmt, None)
+        return payload, None
+    compiled = timeline_cache.get(scenario_id, generation)
+    payload = compiled.payloads.get(fmt)
+    if payload is None:
+        payload = compiled.payloads[fmt] = await _build_payload(
+            db, scenario_id, scenario, 0, TIMELINE_MINUTES, None, fmt, generation
+        )
+    return payload, compiled
+
+
+async def _build_payload(
+    db: AsyncSession,
+    scenario_id: str,
+    scenario: dict[str, Any],
+    start: int,
+    end: int,
+    projection: tuple[str, ...] | None,
+    fmt: str,
+    generation: str | None,
+) -> dict[str, Any]:
+    payload: dict[str, Any] = {"scenario_id": scenario_id, "metadata": scenario}
+    pack = load_scenario_pack(scenario_id, generation) if generation is not None else None
+    if pack is not None:
+        if fmt == "columnar":
+            payload.update(pack.columnar(start, end, projection))
+        else:
+            payload["timeline"] = pack.frames(start, end, projection)
+        return payload
+
+    rows = await fetch_timeline_rows(db, scenario_id, start, end, projection)
+    if rows is None:
+        frames = generate_synthetic_timeline(scenario_id, scenario, start, end, projection)
+        if fmt == "columnar":
+            payload.update(frames_to_columnar(frames, start, end, projection))
+        else:
+            payload["timeline"] = frames
+    elif fmt == "columnar":
+        payload.update(assemble_columnar(rows, projection))
+    else:
+        payload["timeline"] = assemble_frames(rows, projection)
+    return payload
+
+
+# ---------------------------------------------------------------------------
+# Shared playback sessions
+# ---------------------------------------------------------------------------
+
+def _get_playback(session_id: str) -> PlaybackSession:
+    session = playback_sessions.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail=f"Unknown playback session: {session_id}")
+    return session
+
+
+@router.post("/playback/sessions", status_code=201)
+async def create_playback_session(
+    request: PlaybackRequest, db: AsyncSession = Depends(get_db_session)
+) -> dict[str, Any]:
+    scenario = get_scenario(request.scenario_id)
+    if scenario is None:
+        raise HTTPException(status_code=404, detail=f"Unknown scenario_id: {request.scenario_id}")
+    generation = await _current_generation(db)
+    payload, _ = await _full_day_payload(db, request.scenario_id, scenario, "frames", generation)
+    session = playback_sessions.create(
+        request.scenario_id,
+        payload["timeline"],
+        speed=request.speed,
+        start_minute=request.start_minute,
+        loop=request.loop,
     )
+    return session.describe()
+
+
+@router.get("/playback/sessions")
+async def list_playback_sessions() -> list[dict[str, Any]]:
+    return [session.describe() for session in playback_sessions.list()]
 
-    transit_rows = transit_result.scalars().all()
-    prediction_rows = prediction_result.scalars().all()
-    routing_rows = routing_result.scalars().all()
 
-    if not transit_rows and not prediction_rows and not routing_rows:
-        return {
-            "scenario_id": scenario_id,
-            "metadata": scenario,
-            "timeline": generate_synthetic_timeline(scenario_id, scenario),
-        }
+@router.delete("/playback/sessions/{session_id}", status_code=204)
+async def stop_playback_session(session_id: str) -> Response:
+    if not await playback_sessions.stop(session_id):
+        raise HTTPException(status_code=404, detail=f"Unknown playback session: {session_id}")
+    return Response(status_code=204)
 
-    transit_by_minute: dict[int, dict[str, dict[str, int]]] = defaultdict(
-        lambda: {"transit_load": {}, "pedestrian_volume": {}}
+
+@router.get("/playback/sessions/{session_id}/events")
+async def playback_events(session_id: str) -> StreamingResponse:
+    """Follow a playback session as Server-Sent Events."""
+    session = _get_playback(session_id)
+
+    async def body() -> AsyncIterator[bytes]:
+        # Subscribe only once the response streams, so a client that drops
+        # before the first chunk never leaves a queue behind.
+        subscriber = session.subscribe()
+        try:
+            while (message := await subscriber.get()) is not None:
+                yield f"event: frame\ndata: {message}\n\n".encode("utf-8")
+            yield b"event: end\ndata: {}\n\n"
+        finally:
+            session.unsubscribe(subscriber)
+
+    return StreamingResponse(
+        body(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"}
     )
-    for row in transit_rows:
-        minute_bucket = transit_by_minute[row.minute]
-        minute_bucket["transit_load"][row.location_id] = row.transit_load
-        minute_bucket["pedestrian_volume"][row.location_id] = row.pedestrian_volume
-
-    prediction_by_minute = {row.minute: row for row in prediction_rows}
-    routing_by_minute = {row.minute: row for row in routing_rows}
-
-    timeline: list[dict[str, Any]] = []
-    for minute in range(1440):
-        prediction = prediction_by_minute.get(minute)
-        routing = routing_by_minute.get(minute)
-        transit_data = transit_by_minute[minute]
-        threat_score = prediction.egress_threat_score if prediction else 0.0
-        estimated_crowd = prediction.estimated_crowd_volume if prediction else 0
-        predicted_surge_velocity = int(12 + (estimated_crowd / 68_000) * 110 + threat_score * 95)
-        lock_down = predicted_surge_velocity >= int(CRITICAL_CAPACITY_THRESHOLD * 1.1) or threat_score >= 0.9
-        transit_status = {
-            "stadium_station": "LOCKED_DOWN" if lock_down else "OPEN",
-            "king_st": "OPEN",
-        }
-        emergency_corridors = [EMERGENCY_CORRIDOR] if lock_down else []
-
-        timeline.append(
-            {
-                "minute": minute,
-                "time_label": minute_label(minute),
-                "timestamp_label": minute_label(minute),
-                "transit_load": transit_data["transit_load"],
-                "pedestrian_volume": transit_data["pedestrian_volume"],
-                "egress_threat_score": threat_score,
-                "threat_score": threat_score,
-                "estimated_crowd_volume": estimated_crowd,
-                "predicted_surge_velocity": predicted_surge_velocity,
-                "critical_capacity_threshold": CRITICAL_CAPACITY_THRESHOLD,
-                "platform_utilization_pct": int(
-                    round((predicted_surge_velocity / max(CRITICAL_CAPACITY_THRESHOLD, 1)) * 100)
-                ),
-                "game_state": prediction.game_state if prediction else None,
-                "danger_routes": _parse_routes(routing.danger_routes) if routing else [],
-                "safe_routes": _parse_routes(routing.safe_routes) if routing else [],
-                "emergency_corridors": emergency_corridors,
-                "transit_status": transit_status,
-                "ai_log_lines": (
-                    [
-                        "THREAT EXCEEDS PLATFORM LIMIT.",
-                        "EXECUTING STATION LOCKDOWN.",
-                        "MAPPING EMS CORRIDORS.",
-                    ]
-                    if lock_down
-                    else [
-                        "MONITORING CORRIDOR FLOW.",
-                        "CAPACITY WITHIN SAFE LIMITS.",
-                        "NO INTERVENTION REQUIRED.",
-                    ]
-                ),
-                "alert_message": routing.alert_message if routing else None,
-                "severity": routing.severity if routing else None,
-            }
-        )
 
-    return {"scenario_id": scenario_id, "metadata": scenario, "timeline": timeline}
+
+@router.websocket("/playback/sessions/{session_id}/ws")
+async def playback_websocket(websocket: WebSocket, session_id: str) -> None:
+    """Follow a playback session over a WebSocket (one JSON frame per message)."""
+    session = playback_sessions.get(session_id)
+    if session is None:
+        await websocket.close(code=4404)
+        return
+    await websocket.accept()
+    subscriber = session.subscribe()
+    try:
+        while (message := await subscriber.get()) is not None:
+            await websocket.send_text(message)
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        session.unsubscribe(subscriber)
@@ -0,0 +1,332 @@
+"""Memory-mapped "scenario pack" timeline artifacts.
+
+``scripts.precompute`` writes one pack per scenario and precompute generation:
+fixed-dtype ``.npy`` arrays for the per-minute numbers and per-corridor loads,
+plus a shared byte blob with ``(start, stop)`` offset tables for the
+variable-length JSON fields (game state, routes, alert text). The API opens the
+arrays with ``mmap_mode="r"``, so every uvicorn worker shares one page-cache
+copy and a minute window is an array slice instead of a query.
+
+Layout::
+
+    <SCENARIO_PACK_DIR>/<scenario_id>/<generation>/
+        manifest.json
+        threat.npy crowd.npy surge.npy utilization.npy lock_down.npy
+        has_prediction.npy has_routing.npy severity.npy
+        transit_load.npy pedestrian_volume.npy      # minutes x corridors, -1 = missing
+        game_state.npy danger_routes.npy safe_routes.npy alert_message.npy  # offsets
+        variable.bin
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Any, NamedTuple
+
+import numpy as np
+
+from app.api.timeline import (
+    CRITICAL_CAPACITY_THRESHOLD,
+    LOCK_DOWN_FIELDS,
+    TIMELINE_FIELDS,
+    TIMELINE_MINUTES,
+    TRANSIT_FIELDS,
+    TimelineRows,
+    build_timeline_frame,
+    columnar_envelope,
+    columnar_keys,
+    dictionary_encode,
+    lock_down_value,
+    minute_label,
+    parse_routes,
+)
+
+PACK_FORMAT_VERSION = 1
+SCENARIO_PACK_DIR = Path(
+    os.getenv("SCENARIO_PACK_DIR", "").strip()
+    or Path(__file__).resolve().parents[2] / "data" / "scenario_packs"
+)
+_VARIABLE_FIELDS = ("game_state", "danger_routes", "safe_routes", "alert_message")
+
+
+class _PackPrediction(NamedTuple):
+    minute: int
+    egress_threat_score: float
+    estimated_crowd_volume: int
+    game_state: dict[str, Any] | None
+
+
+class _PackRouting(NamedTuple):
+    minute: int
+    danger_routes: list[list[list[float]]]
+    safe_routes: list[list[list[float]]]
+    alert_message: str | None
+    severity: int | None
+
+
+def pack_path(scenario_id: str, generation: str, pack_dir: Path = SCENARIO_PACK_DIR) -> Path:
+    return pack_dir / scenario_id / generation
+
+
+# ---------------------------------------------------------------------------
+# Writer
+# ---------------------------------------------------------------------------
+
+def write_scenario_pack(
+    scenario_id: str,
+    generation: str,
+    rows: TimelineRows,
+    pack_dir: Path = SCENARIO_PACK_DIR,
+) -> Path:
+    """Write the full-day pack for *rows* (see :func:`prune_scenario_packs` for cleanup)."""
+    n = TIMELINE_MINUTES
+    threat = np.zeros(n, dtype=np.float64)
+    crowd = np.zeros(n, dtype=np.int32)
+    has_prediction = np.zeros(n, dtype=np.uint8)
+    has_routing = np.zeros(n, dtype=np.uint8)
+    severity = np.full(n, -1, dtype=np.int32)
+
+    blob = bytearray()
+    blob_index: dict[bytes, tuple[int, int]] = {}
+    offsets = {name: np.zeros((n, 2), dtype=np.int64) for name in _VARIABLE_FIELDS}
+
+    def put(name: str, minute: int, value: Any) -> None:
+        encoded = json.dumps(value, separators=(",", ":")).encode("utf-8")
+        span = blob_index.get(encoded)
+        if span is None:
+            span = blob_index[encoded] = (len(blob), len(blob) + len(encoded))
+            blob.extend(encoded)
+        offsets[name][minute] = span
+
+    for row in rows.predictions:
+        threat[row.minute] = row.egress_threat_score
+        crowd[row.minute] = row.estimated_crowd_volume
+        has_prediction[row.minute] = 1
+        put("game_state", row.minute, row.game_state)
+
+    for row in rows.routing:
+        has_routing[row.minute] = 1
+        if row.severity is not None:
+            severity[row.minute] = row.severity
+        put("danger_routes", row.minute, parse_routes(row.danger_routes))
+        put("safe_routes", row.minute, parse_routes(row.safe_routes))
+        put("alert_message", row.minute, row.alert_message)
+
+    corridors = list(dict.fromkeys(row.location_id for row in rows.transit))
+    column = {location_id: i for i, location_id in enumerate(corridors)}
+    transit_load = np.full((n, len(corridors)), -1, dtype=np.int32)
+    pedestrian_volume = np.full((n, len(corridors)), -1, dtype=np.int32)
+    for row in rows.transit:
+        transit_load[row.minute, column[row.location_id]] = row.transit_load
+        pedestrian_volume[row.minute, column[row.location_id]] = row.pedestrian_volume
+
+    # Derived values use the exact scalar expressions of build_timeline_frame.
+    surge = np.array(
+        [int(12 + (c / 68_000) * 110 + t * 95) for t, c in zip(threat.tolist(), crowd.tolist())],
+        dtype=np.int32,
+    )
+    utilization = np.array(
+        [int(round((s / max(CRITICAL_CAPACITY_THRESHOLD, 1)) * 100)) for s in surge.tolist()],
+        dtype=np.int32,
+    )
+    lock_down = (
+        (surge >= int(CRITICAL_CAPACITY_THRESHOLD * 1.1)) | (threat >= 0.9)
+    ).astype(np.uint8)
+
+    target = pack_path(scenario_id, generation, pack_dir)
+    staging = target.with_name(f".{generation}.tmp")
+    if staging.exists():
+        shutil.rmtree(staging)
+    staging.mkdir(parents=True)
+
+    arrays = {
+        "threat": threat,
+        "crowd": crowd,
+        "surge": surge,
+        "utilization": utilization,
+        "lock_down": lock_down,
+        "has_prediction": has_prediction,
+        "has_routing": has_routing,
+        "severity": severity,
+        "transit_load": transit_load,
+        "pedestrian_volume": pedestrian_volume,
+        **offsets,
+    }
+    for name, array in arrays.items():
+        np.save(staging / f"{name}.npy", array)
+    (staging / "variable.bin").write_bytes(bytes(blob))
+    manifest = {
+        "format_version": PACK_FORMAT_VERSION,
+        "scenario_id": scenario_id,
+        "generation": generation,
+        "minutes": n,
+        "corridors": corridors,
+    }
+    (staging / "manifest.json").write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+
+    if target.exists():
+        shutil.rmtree(target)
+    staging.rename(target)
+    return target
+
+
+def prune_scenario_packs(
+    scenario_id: str, keep_generation: str, pack_dir: Path = SCENARIO_PACK_DIR
+) -> None:
+    """Delete every pack of *scenario_id* except *keep_generation*.
+
+    Run only after *keep_generation* is the committed generation stamp, so no
+    server is still pointed at a pack this removes.
+    """
+    keep = pack_path(scenario_id, keep_generation, pack_dir)
+    if not keep.parent.exists():
+        return
+    for stale in keep.parent.iterdir():
+        if stale != keep and stale.is_dir():
+            shutil.rmtree(stale, ignore_errors=True)
+
+
+# ---------------------------------------------------------------------------
+# Reader
+# ---------------------------------------------------------------------------
+
+class ScenarioPack:
+    """Read-only view over a pack directory; arrays are memory-mapped."""
+
+    def __init__(self, path: Path) -> None:
+        manifest = json.loads((path / "manifest.json").read_text(encoding="utf-8"))
+        if manifest.get("format_version") != PACK_FORMAT_VERSION:
+            raise ValueError(f"Unsupported scenario pack format in {path}")
+        self.path = path
+        self.scenario_id: str = manifest["scenario_id"]
+        self.generation: str = manifest["generation"]
+        self.corridors: list[str] = manifest["corridors"]
+        self._arrays = {
+            entry.stem: np.load(entry, mmap_mode="r") for entry in path.glob("*.npy")
+        }
+        blob_path = path / "variable.bin"
+        # np.memmap refuses zero-length files.
+        self._blob = (
+            np.memmap(blob_path, dtype=np.uint8, mode="r")
+            if blob_path.stat().st_size
+            else np.zeros(0, dtype=np.uint8)
+        )
+
+    def _decode_column(self, name: str, start: int, end: int) -> list[Any]:
+        """JSON values of a variable-length field; each distinct span decodes once."""
+        spans = self._arrays[name][start:end]
+        decoded: dict[tuple[int, int], Any] = {}
+        values: list[Any] = []
+        for lo, hi in spans.tolist():
+            span = (lo, hi)
+            if span not in decoded:
+                decoded[span] = json.loads(self._blob[lo:hi].tobytes()) if hi > lo else None
+            values.append(decoded[span])
+        return values
+
+    def frames(self, start: int, end: int, projection: tuple[str, ...] | None) -> list[dict[str, Any]]:
+        a = self._arrays
+        threat = a["threat"][start:end].tolist()
+        crowd = a["crowd"][start:end].tolist()
+        has_prediction = a["has_prediction"][start:end].tolist()
+        has_routing = a["has_routing"][start:end].tolist()
+        severity = a["severity"][start:end].tolist()
+        game_state = self._decode_column("game_state", start, end)
+        danger = self._decode_column("danger_routes", start, end)
+        safe = self._decode_column("safe_routes", start, end)
+        alert = self._decode_column("alert_message", start, end)
+        loads = a["transit_load"][start:end].tolist()
+        volumes = a["pedestrian_volume"][start:end].tolist()
+
+        frames: list[dict[str, Any]] = []
+        for i, minute in enumerate(range(start, end)):
+            prediction = (
+                _PackPrediction(minute, threat[i], crowd[i], game_state[i])
+                if has_prediction[i]
+                else None
+            )
+            routing = (
+                _PackRouting(
+                    minute, danger[i], safe[i], alert[i], severity[i] if severity[i] >= 0 else None
+                )
+                if has_routing[i]
+                else None
+            )
+            transit_data = {
+                "transit_load": {
+                    loc: value for loc, value in zip(self.corridors, loads[i]) if value >= 0
+                },
+                "pedestrian_volume": {
+                    loc: value for loc, value in zip(self.corridors, volumes[i]) if value >= 0
+                },
+            }
+            frames.append(build_timeline_frame(minute, prediction, routing, transit_data, projection))
+        return frames
+
+    def columnar(self, start: int, end: int, projection: tuple[str, ...] | None) -> dict[str, Any]:
+        a = self._arrays
+        wanted = columnar_keys(projection)
+        has_routing = a["has_routing"][start:end]
+        plain = {
+            "time_label": lambda: [minute_label(m) for m in range(start, end)],
+            "threat_score": lambda: a["threat"][start:end].tolist(),
+            "estimated_crowd_volume": lambda: a["crowd"][start:end].tolist(),
+            "predicted_surge_velocity": lambda: a["surge"][start:end].tolist(),
+            "platform_utilization_pct": lambda: a["utilization"][start:end].tolist(),
+            "severity": lambda: [
+                value if value >= 0 and routed else None
+                for value, routed in zip(a["severity"][start:end].tolist(), has_routing.tolist())
+            ],
+        }
+
+        columns: dict[str, list[Any]] = {}
+        dictionaries: dict[str, list[Any]] = {}
+        for name in plain:
+            if name in wanted:
+                columns[name] = plain[name]()
+        for name in _VARIABLE_FIELDS:
+            if name not in wanted:
+                continue
+            values = self._decode_column(name, start, end)
+            if name in ("danger_routes", "safe_routes"):
+                values = [v if routed else [] for v, routed in zip(values, has_routing.tolist())]
+            columns[name], dictionaries[name] = dictionary_encode(values)
+        for name in LOCK_DOWN_FIELDS:
+            if name in wanted:
+                columns[name] = a["lock_down"][start:end].astype(np.int64).tolist()
+                dictionaries[name] = [lock_down_value(name, False), lock_down_value(name, True)]
+
+        corridors: dict[str, dict[str, list[Any]]] = {}
+        for name in sorted(TRANSIT_FIELDS & wanted):
+            matrix = a[name][start:end]
+            corridors[name] = {
+                loc: [value if value >= 0 else None for value in matrix[:, i].tolist()]
+                for i, loc in enumerate(self.corridors)
+            }
+
+        ordered = {name: columns[name] for name in TIMELINE_FIELDS if name in columns}
+        return columnar_envelope(start, end, projection, ordered, dictionaries, corridors)
+
+
+_PACKS: dict[tuple[str, str], ScenarioPack] = {}
+
+
+def load_scenario_pack(
+    scenario_id: str, generation: str, pack_dir: Path = SCENARIO_PACK_DIR
+) -> ScenarioPack | None:
+    """Return the pack for *generation*, or ``None`` if precompute did not write one."""
+    key = (scenario_id, generation)
+    pack = _PACKS.get(key)
+    if pack is not None:
+        return pack
+    path = pack_path(scenario_id, generation, pack_dir)
+    if not (path / "manifest.json").exists():
+        return None
+    pack = _PACKS[key] = ScenarioPack(path)
+    # Only the current generation is worth keeping mapped.
+    for stale in [k for k in _PACKS if k[0] == scenario_id and k != key]:
+        del _PACKS[stale]
+    return pack
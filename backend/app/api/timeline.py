@@ -0,0 +1,594 @@
+"""Timeline frame assembly for the scenario timeseries API.
+
+Reads the precomputed ``transit_cache`` / ``predictions`` / ``routing_decisions``
+rows for a minute window and turns them into either per-minute frames (the
+default response) or a columnar payload.
+"""
+
+from __future__ import annotations
+
+import json
+from collections.abc import AsyncIterator, Sequence
+from dataclasses import dataclass
+from typing import Any
+
+from fastapi import HTTPException
+from sqlalchemy import Row, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import Predictions, RoutingDecisions, TransitCache
+
+CRITICAL_CAPACITY_THRESHOLD = 133
+TIMELINE_MINUTES = 1440
+# Minutes read per query when streaming; bounds per-request memory.
+STREAM_CHUNK_MINUTES = 60
+EMERGENCY_CORRIDOR = [
+    [47.6044, -122.3238],
+    [47.6019, -122.3258],
+    [47.5994, -122.3282],
+    [47.5972, -122.3299],
+    [47.5952, -122.3316],
+]
+AI_LOG_CRITICAL = [
+    "THREAT EXCEEDS PLATFORM LIMIT.",
+    "EXECUTING STATION LOCKDOWN.",
+    "MAPPING EMS CORRIDORS.",
+]
+AI_LOG_NOMINAL = [
+    "MONITORING CORRIDOR FLOW.",
+    "CAPACITY WITHIN SAFE LIMITS.",
+    "NO INTERVENTION REQUIRED.",
+]
+
+# Every key a timeline frame can carry, in response order. ``minute`` is always
+# returned so projected frames can still be placed on the timeline.
+TIMELINE_FIELDS = (
+    "minute",
+    "time_label",
+    "timestamp_label",
+    "transit_load",
+    "pedestrian_volume",
+    "egress_threat_score",
+    "threat_score",
+    "estimated_crowd_volume",
+    "predicted_surge_velocity",
+    "critical_capacity_threshold",
+    "platform_utilization_pct",
+    "game_state",
+    "danger_routes",
+    "safe_routes",
+    "emergency_corridors",
+    "transit_status",
+    "ai_log_lines",
+    "alert_message",
+    "severity",
+)
+TRANSIT_FIELDS = frozenset({"transit_load", "pedestrian_volume"})
+ROUTING_FIELDS = frozenset({"danger_routes", "safe_routes", "alert_message", "severity"})
+
+
+def minute_label(minute: int) -> str:
+    hour = minute // 60
+    mins = minute % 60
+    return f"{hour:02d}:{mins:02d}"
+
+
+def parse_timeline_fields(fields: str | None) -> tuple[str, ...] | None:
+    """Parse a comma-separated ``fields=`` projection into ordered frame keys.
+
+    Returns ``None`` when no projection was requested (full frames).
+    """
+    if fields is None or not fields.strip():
+        return None
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = sorted(requested.difference(TIMELINE_FIELDS))
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown timeline fields: {', '.join(unknown)}",
+        )
+    requested.add("minute")
+    return tuple(name for name in TIMELINE_FIELDS if name in requested)
+
+
+def project_frame(frame: dict[str, Any], fields: tuple[str, ...] | None) -> dict[str, Any]:
+    if fields is None:
+        return frame
+    return {name: frame[name] for name in fields}
+
+
+def parse_routes(routes: Any) -> list[list[list[float]]]:
+    if not routes:
+        return []
+    if isinstance(routes, str):
+        try:
+            routes = json.loads(routes)
+        except json.JSONDecodeError:
+            return []
+    if not isinstance(routes, list):
+        return []
+    normalized: list[list[list[float]]] = []
+    for route in routes:
+        path = route.get("path") if isinstance(route, dict) else route
+        if not isinstance(path, list):
+            continue
+        line: list[list[float]] = []
+        for point in path:
+            if (
+                isinstance(point, list)
+                and len(point) >= 2
+                and isinstance(point[0], (int, float))
+                and isinstance(point[1], (int, float))
+            ):
+                line.append([float(point[0]), float(point[1])])
+        if len(line) >= 2:
+            normalized.append(line)
+    return normalized
+
+
+def generate_synthetic_timeline(
+    scenario_id: str,
+    scenario: dict[str, Any],
+    start: int = 0,
+    end: int = TIMELINE_MINUTES,
+    fields: tuple[str, ...] | None = None,
+) -> list[dict[str, Any]]:
+    timeline: list[dict[str, Any]] = []
+    is_blowout = "blowout" in scenario_id.lower()
+    for minute in range(start, end):
+        label = minute_label(minute)
+        threat = 0.12
+        game_state: dict[str, Any] | None = None
+        if 1080 <= minute < 1260:
+            game_state = {"home": 0, "away": 0, "clock": "15:00", "qtr": 1, "quarter": 1}
+            if is_blowout and minute >= 1125:
+                game_state = {"home": 14, "away": 42, "clock": "6:12", "qtr": 3, "quarter": 3}
+                threat = 0.95
+            elif minute >= 1200:
+                threat = 0.62
+            else:
+                threat = 0.35
+
+        surge = int(25 + threat * 170)
+        lock_down = surge >= int(CRITICAL_CAPACITY_THRESHOLD * 1.1) or threat >= 0.9
+        transit_status = {
+            "stadium_station": "LOCKED_DOWN" if lock_down else "OPEN",
+            "king_st": "OPEN",
+        }
+        emergency_corridors = [EMERGENCY_CORRIDOR] if lock_down else []
+
+        frame = {
+            "minute": minute,
+            "time_label": label,
+            "timestamp_label": label,
+            "transit_load": {},
+            "pedestrian_volume": {},
+            "egress_threat_score": round(threat, 3),
+            "threat_score": round(threat, 3),
+            "estimated_crowd_volume": int(threat * 68000),
+            "predicted_surge_velocity": surge,
+            "critical_capacity_threshold": CRITICAL_CAPACITY_THRESHOLD,
+            "platform_utilization_pct": int(round((surge / CRITICAL_CAPACITY_THRESHOLD) * 100)),
+            "game_state": game_state,
+            "danger_routes": [],
+            "safe_routes": [],
+            "emergency_corridors": emergency_corridors,
+            "transit_status": transit_status,
+            "ai_log_lines": AI_LOG_CRITICAL if lock_down else AI_LOG_NOMINAL,
+            "alert_message": (
+                "CRITICAL: Surge velocity exceeds platform limit."
+                if lock_down
+                else "All systems normal."
+            ),
+            "severity": 5 if lock_down else 1,
+        }
+        timeline.append(project_frame(frame, fields))
+    return timeline
+
+
+def build_timeline_frame(
+    minute: int,
+    prediction: Row | None,
+    routing: Row | None,
+    transit_data: dict[str, dict[str, int]] | None,
+    fields: tuple[str, ...] | None = None,
+) -> dict[str, Any]:
+    """Assemble one timeline frame from the precomputed rows for *minute*.
+
+    Route JSON is only parsed when the route keys are part of the projection.
+    """
+    threat_score = prediction.egress_threat_score if prediction else 0.0
+    estimated_crowd = prediction.estimated_crowd_volume if prediction else 0
+    predicted_surge_velocity = int(12 + (estimated_crowd / 68_000) * 110 + threat_score * 95)
+    lock_down = predicted_surge_velocity >= int(CRITICAL_CAPACITY_THRESHOLD * 1.1) or threat_score >= 0.9
+    label = minute_label(minute)
+    wants_routes = fields is None or "danger_routes" in fields or "safe_routes" in fields
+
+    frame = {
+        "minute": minute,
+        "time_label": label,
+        "timestamp_label": label,
+        "transit_load": transit_data["transit_load"] if transit_data else {},
+        "pedestrian_volume": transit_data["pedestrian_volume"] if transit_data else {},
+        "egress_threat_score": threat_score,
+        "threat_score": threat_score,
+        "estimated_crowd_volume": estimated_crowd,
+        "predicted_surge_velocity": predicted_surge_velocity,
+        "critical_capacity_threshold": CRITICAL_CAPACITY_THRESHOLD,
+        "platform_utilization_pct": int(
+            round((predicted_surge_velocity / max(CRITICAL_CAPACITY_THRESHOLD, 1)) * 100)
+        ),
+        "game_state": prediction.game_state if prediction else None,
+        "danger_routes": parse_routes(routing.danger_routes) if routing and wants_routes else [],
+        "safe_routes": parse_routes(routing.safe_routes) if routing and wants_routes else [],
+        "emergency_corridors": [EMERGENCY_CORRIDOR] if lock_down else [],
+        "transit_status": {
+            "stadium_station": "LOCKED_DOWN" if lock_down else "OPEN",
+            "king_st": "OPEN",
+        },
+        "ai_log_lines": AI_LOG_CRITICAL if lock_down else AI_LOG_NOMINAL,
+        "alert_message": routing.alert_message if routing else None,
+        "severity": routing.severity if routing else None,
+    }
+    return project_frame(frame, fields)
+
+
+# Plain column tuples read for each table; no ORM instances are built.
+_PREDICTION_COLUMNS = (
+    Predictions.minute,
+    Predictions.egress_threat_score,
+    Predictions.estimated_crowd_volume,
+    Predictions.game_state,
+)
+_ROUTING_COLUMNS = (
+    RoutingDecisions.minute,
+    RoutingDecisions.danger_routes,
+    RoutingDecisions.safe_routes,
+    RoutingDecisions.alert_message,
+    RoutingDecisions.severity,
+)
+_TRANSIT_COLUMNS = (
+    TransitCache.minute,
+    TransitCache.location_id,
+    TransitCache.transit_load,
+    TransitCache.pedestrian_volume,
+)
+
+
+@dataclass
+class TimelineRows:
+    """Precomputed rows for one scenario's minute window, each ordered by minute."""
+
+    start: int
+    end: int
+    predictions: Sequence[Row]
+    routing: Sequence[Row]
+    transit: Sequence[Row]
+
+
+async def _select_window(
+    db: AsyncSession, columns: tuple[Any, ...], scenario_id: str, start: int, end: int
+) -> Sequence[Row]:
+    model = columns[0].class_
+    result = await db.execute(
+        select(*columns)
+        .where(model.scenario_id == scenario_id, model.minute >= start, model.minute < end)
+        .order_by(model.minute)
+    )
+    return result.all()
+
+
+async def fetch_timeline_rows(
+    db: AsyncSession,
+    scenario_id: str,
+    start: int,
+    end: int,
+    projection: tuple[str, ...] | None,
+) -> TimelineRows | None:
+    """Read the minute window from the cache tables.
+
+    Returns ``None`` when precompute has never written this scenario, in which
+    case callers serve the synthetic timeline.
+    """
+    # Only touch the tables the projection actually needs, and only the
+    # requested minute window of them.
+    needs_transit = projection is None or not TRANSIT_FIELDS.isdisjoint(projection)
+    needs_routing = projection is None or not ROUTING_FIELDS.isdisjoint(projection)
+
+    prediction_rows = await _select_window(db, _PREDICTION_COLUMNS, scenario_id, start, end)
+    transit_rows: Sequence[Row] = []
+    if needs_transit:
+        transit_rows = await _select_window(db, _TRANSIT_COLUMNS, scenario_id, start, end)
+    routing_rows: Sequence[Row] = []
+    if needs_routing:
+        routing_rows = await _select_window(db, _ROUTING_COLUMNS, scenario_id, start, end)
+
+    if not transit_rows and not prediction_rows and not routing_rows:
+        if not await _scenario_has_rows(db, scenario_id):
+            return None
+    return TimelineRows(start, end, prediction_rows, routing_rows, transit_rows)
+
+
+async def _scenario_has_rows(db: AsyncSession, scenario_id: str) -> bool:
+    """Whether precompute wrote anything for *scenario_id* outside the window."""
+    for model in (Predictions, TransitCache, RoutingDecisions):
+        result = await db.execute(
+            select(model.id).where(model.scenario_id == scenario_id).limit(1)
+        )
+        if result.first() is not None:
+            return True
+    return False
+
+
+def assemble_frames(rows: TimelineRows, projection: tuple[str, ...] | None) -> list[dict[str, Any]]:
+    """Build the per-minute frame list for *rows* in one merge pass.
+
+    All three row lists are ordered by minute, so each is consumed with a
+    cursor instead of being regrouped into per-minute lookup dicts.
+    """
+    predictions, routing, transit = rows.predictions, rows.routing, rows.transit
+    p = r = t = 0
+    frames: list[dict[str, Any]] = []
+    for minute in range(rows.start, rows.end):
+        prediction = None
+        if p < len(predictions) and predictions[p].minute == minute:
+            prediction = predictions[p]
+            p += 1
+        routing_row = None
+        if r < len(routing) and routing[r].minute == minute:
+            routing_row = routing[r]
+            r += 1
+        transit_data: dict[str, dict[str, int]] = {"transit_load": {}, "pedestrian_volume": {}}
+        while t < len(transit) and transit[t].minute == minute:
+            row = transit[t]
+            transit_data["transit_load"][row.location_id] = row.transit_load
+            transit_data["pedestrian_volume"][row.location_id] = row.pedestrian_volume
+            t += 1
+        frames.append(build_timeline_frame(minute, prediction, routing_row, transit_data, projection))
+    return frames
+
+
+async def iter_timeline_frames(
+    db: AsyncSession,
+    scenario_id: str,
+    scenario: dict[str, Any],
+    start: int,
+    end: int,
+    projection: tuple[str, ...] | None,
+    chunk_minutes: int = STREAM_CHUNK_MINUTES,
+) -> AsyncIterator[dict[str, Any]]:
+    """Yield frames for ``[start, end)`` reading at most *chunk_minutes* at a time."""
+    for chunk_start in range(start, end, chunk_minutes):
+        chunk_end = min(end, chunk_start + chunk_minutes)
+        rows = await fetch_timeline_rows(db, scenario_id, chunk_start, chunk_end, projection)
+        if rows is None:
+            frames = generate_synthetic_timeline(
+                scenario_id, scenario, chunk_start, chunk_end, projection
+            )
+        else:
+            frames = assemble_frames(rows, projection)
+        for frame in frames:
+            yield frame
+
+
+# ---------------------------------------------------------------------------
+# Columnar format
+#
+# One array per frame key (and per corridor for the transit keys) instead of a
+# list of frames. Keys whose values repeat across minutes are dictionary
+# encoded: the column holds integer codes into ``dictionaries[key]``. Minutes
+# are implicit (``start + index``), the constant threshold is sent once, and
+# duplicate keys are listed under ``aliases`` rather than repeated.
+# ---------------------------------------------------------------------------
+COLUMNAR_ALIASES = {"timestamp_label": "time_label", "egress_threat_score": "threat_score"}
+_CONSTANT_FIELDS = frozenset({"critical_capacity_threshold"})
+LOCK_DOWN_FIELDS = frozenset({"emergency_corridors", "transit_status", "ai_log_lines"})
+_DICTIONARY_FIELDS = frozenset(
+    {"game_state", "danger_routes", "safe_routes", "alert_message"} | LOCK_DOWN_FIELDS
+)
+
+
+def lock_down_value(field_name: str, lock_down: bool) -> Any:
+    if field_name == "emergency_corridors":
+        return [EMERGENCY_CORRIDOR] if lock_down else []
+    if field_name == "transit_status":
+        return {"stadium_station": "LOCKED_DOWN" if lock_down else "OPEN", "king_st": "OPEN"}
+    return AI_LOG_CRITICAL if lock_down else AI_LOG_NOMINAL
+
+
+def _dictionary_key(value: Any) -> Any:
+    if value is None or isinstance(value, (str, int, float)):
+        return value
+    return json.dumps(value, sort_keys=True)
+
+
+def dictionary_encode(values: Sequence[Any], decode: Any = None) -> tuple[list[int], list[Any]]:
+    """Return ``(codes, distinct_values)`` for *values*.
+
+    Unhashable values are keyed by their canonical JSON. ``decode`` is applied
+    once per distinct raw value (used to parse route JSON only once), and
+    values that decode equal share a code, so a dictionary only depends on
+    the decoded column, not on how it was stored.
+    """
+    codes: list[int] = []
+    distinct: list[Any] = []
+    index: dict[Any, int] = {}
+    raw_index: dict[Any, int] = {}
+    for value in values:
+        raw_key = _dictionary_key(value)
+        code = raw_index.get(raw_key)
+        if code is None:
+            decoded = decode(value) if decode is not None else value
+            key = _dictionary_key(decoded)
+            code = index.get(key)
+            if code is None:
+                code = index[key] = len(distinct)
+                distinct.append(decoded)
+            raw_index[raw_key] = code
+        codes.append(code)
+    return codes, distinct
+
+
+def columnar_keys(projection: tuple[str, ...] | None) -> set[str]:
+    """Frame keys that get a column; aliases resolve to their target key."""
+    names = TIMELINE_FIELDS if projection is None else projection
+    return {
+        COLUMNAR_ALIASES.get(name, name)
+        for name in names
+        if name != "minute" and name not in _CONSTANT_FIELDS
+    }
+
+
+def columnar_envelope(
+    start: int,
+    end: int,
+    projection: tuple[str, ...] | None,
+    columns: dict[str, list[Any]],
+    dictionaries: dict[str, list[Any]],
+    corridors: dict[str, dict[str, list[Any]]],
+) -> dict[str, Any]:
+    names = TIMELINE_FIELDS if projection is None else projection
+    return {
+        "format": "columnar",
+        "start": start,
+        "end": end,
+        "constants": {
+            name: CRITICAL_CAPACITY_THRESHOLD for name in _CONSTANT_FIELDS if name in names
+        },
+        "aliases": {
+            alias: target for alias, target in COLUMNAR_ALIASES.items() if alias in names
+        },
+        "columns": columns,
+        "dictionaries": dictionaries,
+        "corridors": corridors,
+    }
+
+
+def assemble_columnar(rows: TimelineRows, projection: tuple[str, ...] | None) -> dict[str, Any]:
+    """Build the columnar payload for *rows* without materializing frames."""
+    start, end = rows.start, rows.end
+    size = end - start
+    wanted = columnar_keys(projection)
+
+    threat = [0.0] * size
+    crowd = [0] * size
+    game_state: list[Any] = [None] * size
+    for row in rows.predictions:
+        i = row.minute - start
+        threat[i] = row.egress_threat_score
+        crowd[i] = row.estimated_crowd_volume
+        game_state[i] = row.game_state
+
+    danger: list[Any] = [None] * size
+    safe: list[Any] = [None] * size
+    alert: list[str | None] = [None] * size
+    severity: list[int | None] = [None] * size
+    for row in rows.routing:
+        i = row.minute - start
+        danger[i] = row.danger_routes
+        safe[i] = row.safe_routes
+        alert[i] = row.alert_message
+        severity[i] = row.severity
+
+    surge = [int(12 + (c / 68_000) * 110 + t * 95) for t, c in zip(threat, crowd)]
+    lock_limit = int(CRITICAL_CAPACITY_THRESHOLD * 1.1)
+    lock_down = [s >= lock_limit or t >= 0.9 for s, t in zip(surge, threat)]
+
+    raw: dict[str, list[Any]] = {
+        "time_label": [minute_label(m) for m in range(start, end)],
+        "threat_score": threat,
+        "estimated_crowd_volume": crowd,
+        "predicted_surge_velocity": surge,
+        "platform_utilization_pct": [
+            int(round((s / max(CRITICAL_CAPACITY_THRESHOLD, 1)) * 100)) for s in surge
+        ],
+        "game_state": game_state,
+        "severity": severity,
+        "alert_message": alert,
+    }
+
+    columns: dict[str, list[Any]] = {}
+    dictionaries: dict[str, list[Any]] = {}
+    for name in TIMELINE_FIELDS:
+        if name not in wanted or name in TRANSIT_FIELDS:
+            continue
+        if name in LOCK_DOWN_FIELDS:
+            columns[name] = [int(flag) for flag in lock_down]
+            dictionaries[name] = [lock_down_value(name, False), lock_down_value(name, True)]
+        elif name in ("danger_routes", "safe_routes"):
+            source = danger if name == "danger_routes" else safe
+            columns[name], dictionaries[name] = dictionary_encode(source, parse_routes)
+        elif name in _DICTIONARY_FIELDS:
+            columns[name], dictionaries[name] = dictionary_encode(raw[name])
+        else:
+            columns[name] = raw[name]
+
+    corridors: dict[str, dict[str, list[Any]]] = {}
+    for name in ("transit_load", "pedestrian_volume"):
+        if name in wanted:
+            corridors[name] = {}
+    if corridors:
+        for row in rows.transit:
+            i = row.minute - start
+            for name, per_corridor in corridors.items():
+                series = per_corridor.get(row.location_id)
+                if series is None:
+                    series = per_corridor[row.location_id] = [None] * size
+                series[i] = getattr(row, name)
+
+    return columnar_envelope(start, end, projection, columns, dictionaries, corridors)
+
+
+def frames_to_columnar(
+    frames: Sequence[dict[str, Any]],
+    start: int,
+    end: int,
+    projection: tuple[str, ...] | None,
+) -> dict[str, Any]:
+    """Columnar payload for already-built frames (the synthetic fallback)."""
+    columns: dict[str, list[Any]] = {}
+    dictionaries: dict[str, list[Any]] = {}
+    corridors: dict[str, dict[str, list[Any]]] = {}
+    wanted = columnar_keys(projection)
+    for name in TIMELINE_FIELDS:
+        if name not in wanted:
+            continue
+        if name in TRANSIT_FIELDS:
+            per_corridor: dict[str, list[Any]] = {}
+            for i, frame in enumerate(frames):
+                for location_id, value in frame[name].items():
+                    per_corridor.setdefault(location_id, [None] * len(frames))[i] = value
+            corridors[name] = per_corridor
+        elif name in LOCK_DOWN_FIELDS:
+            # Same fixed codes as the DB and pack paths: 0 open, 1 locked down.
+            locked = lock_down_value(name, True)
+            columns[name] = [int(frame[name] == locked) for frame in frames]
+            dictionaries[name] = [lock_down_value(name, False), locked]
+        elif name in _DICTIONARY_FIELDS:
+            columns[name], dictionaries[name] = dictionary_encode([frame[name] for frame in frames])
+        else:
+            columns[name] = [frame[name] for frame in frames]
+    return columnar_envelope(start, end, projection, columns, dictionaries, corridors)
+
+
+def slice_columnar(
+    payload: dict[str, Any],
+    start: int,
+    end: int,
+    projection: tuple[str, ...] | None,
+) -> dict[str, Any]:
+    """Cut a minute window / projection out of a full-day columnar payload."""
+    lo, hi = start - payload["start"], end - payload["start"]
+    wanted = columnar_keys(projection)
+    columns = {
+        name: values[lo:hi] for name, values in payload["columns"].items() if name in wanted
+    }
+    dictionaries = {
+        name: values for name, values in payload["dictionaries"].items() if name in wanted
+    }
+    corridors = {
+        name: {location_id: series[lo:hi] for location_id, series in per_corridor.items()}
+        for name, per_corridor in payload["corridors"].items()
+        if name in wanted
+    }
+    return columnar_envelope(start, end, projection, columns, dictionaries, corridors)
@@ -0,0 +1,87 @@
+"""In-process cache of compiled scenario timelines.
+
+Timelines only change when ``scripts.precompute`` runs, so each scenario's fully
+assembled payload is kept in memory together with its serialized JSON body and
+reused until the precompute generation stamp moves on.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+from dataclasses import dataclass, field
+from typing import Any
+
+
+def dump_json(payload: Any) -> bytes:
+    """Serialize exactly like FastAPI's default ``JSONResponse``."""
+    return json.dumps(
+        payload,
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def make_etag(generation: str, *parts: Any) -> str:
+    """Return a strong ETag for a response derived from *generation*."""
+    digest = hashlib.sha256(
+        "|".join([generation, *(str(part) for part in parts)]).encode("utf-8")
+    ).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Evaluate an ``If-None-Match`` header against a strong ETag."""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+@dataclass
+class CompiledTimeline:
+    """A scenario's full-day payloads for one precompute generation.
+
+    Each response format (``frames``, ``columnar``) is compiled on first use
+    and serialized at most once.
+    """
+
+    generation: str
+    payloads: dict[str, dict[str, Any]] = field(default_factory=dict)
+    _bodies: dict[str, bytes] = field(default_factory=dict, repr=False)
+
+    def body(self, fmt: str) -> bytes:
+        """The full *fmt* payload serialized once and reused for every full response."""
+        body = self._bodies.get(fmt)
+        if body is None:
+            body = self._bodies[fmt] = dump_json(self.payloads[fmt])
+        return body
+
+
+class TimelineCache:
+    """Per-scenario store invalidated by precompute generation."""
+
+    def __init__(self) -> None:
+        self._entries: dict[str, CompiledTimeline] = {}
+
+    def get(self, scenario_id: str, generation: str) -> CompiledTimeline:
+        """Return the entry for *generation*, replacing any stale one."""
+        entry = self._entries.get(scenario_id)
+        if entry is None or entry.generation != generation:
+            entry = self._entries[scenario_id] = CompiledTimeline(generation=generation)
+        return entry
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+timeline_cache = TimelineCache()
@@ -17,6 +17,9 @@ class Settings(BaseSettings):
     nfl_data_dir: str = "./backend/data/nfl_csvs"
     database_url: str = "sqlite+aiosqlite:///./safetransit.db"
     backend_cors_origins: str = "http://localhost:5173"
+    # Required in the X-Admin-Token header by /api/admin; admin routes are
+    # disabled while unset.
+    admin_token: str | None = None
 
     @property
     def cors_origins(self) -> list[str]:
@@ -67,3 +67,17 @@ class RoutingDecisions(Base):
     updated_at: Mapped[DateTime] = mapped_column(
         DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
     )
+
+
+class PrecomputeRuns(Base):
+    """One row per completed ``scripts.precompute`` run.
+
+    The newest ``generation`` identifies the data currently in the cache tables
+    and is what the API keys its compiled timelines and ETags on.
+    """
+
+    __tablename__ = "precompute_runs"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    generation: Mapped[str] = mapped_column(String(64), unique=True)
+    created_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now())
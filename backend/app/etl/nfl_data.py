@@ -1,10 +1,14 @@
 from __future__ import annotations
 
+from collections.abc import Iterable
 from pathlib import Path
 from typing import Any
 
+import numpy as np
 import pandas as pd
 
+from app.etl.nfl_store import load_games
+
 PROJECT_ROOT = Path(__file__).resolve().parents[3]
 
 
@@ -51,20 +55,6 @@ _COLS = [
 ]
 
 
-def _game_seconds_to_wall_minute(game_secs: float) -> int:
-    """Map ``game_seconds_remaining`` (3 600→0) to our daily-minute timeline.
-
-    First half  (3 600→1 800) → minutes 1 110 – 1 175
-    Halftime                  → minutes 1 175 – 1 195  (no plays)
-    Second half (1 800→0)     → minutes 1 195 – 1 260
-    """
-    if game_secs > 1800:
-        frac = (3600 - game_secs) / 1800
-        return GAME_START_MINUTE + int(frac * HALF_DURATION)
-    frac = (1800 - game_secs) / 1800
-    return _SECOND_HALF_START + int(frac * HALF_DURATION)
-
-
 def _format_clock(time_str: str | float) -> str:
     """Normalise the ``time`` column (e.g. '8:22' or '8:22:00') to 'M:SS'."""
     if pd.isna(time_str):
@@ -83,38 +73,138 @@ def _summarise_play(desc: str | float) -> str:
     return str(desc)[:120]
 
 
-def _build_game_timeline(game_df: pd.DataFrame) -> dict[int, dict[str, Any]]:
-    """Convert a single game's play-by-play into a {wall_minute: game_state} map."""
-    timeline: dict[int, dict[str, Any]] = {}
+def _clock_seconds(clock: str) -> int:
+    parts = clock.split(":")
+    return int(parts[0]) * 60 + int(parts[1]) if len(parts) == 2 else 900
 
-    for _, play in game_df.iterrows():
-        game_secs = play["game_seconds_remaining"]
-        if pd.isna(game_secs):
-            continue
 
-        wall_min = _game_seconds_to_wall_minute(float(game_secs))
-        wall_min = max(GAME_START_MINUTE, min(_GAME_END_MINUTE, wall_min))
+def _wall_minutes(game_secs: np.ndarray) -> np.ndarray:
+    """Map ``game_seconds_remaining`` (3 600→0) to our daily-minute timeline.
 
-        clock_str = _format_clock(play["time"])
-        clock_parts = clock_str.split(":")
-        clock_secs = (
-            int(clock_parts[0]) * 60 + int(clock_parts[1])
-            if len(clock_parts) == 2 else 900
-        )
+    First half  (3 600→1 800) → minutes 1 110 – 1 175
+    Halftime                  → minutes 1 175 – 1 195  (no plays)
+    Second half (1 800→0)     → minutes 1 195 – 1 260
 
-        state: dict[str, Any] = {
-            "quarter": int(play["qtr"]) if not pd.isna(play["qtr"]) else None,
-            "clock": clock_str,
-            "clock_seconds_remaining": clock_secs,
-            "home": int(play["total_home_score"]) if not pd.isna(play["total_home_score"]) else 0,
-            "away": int(play["total_away_score"]) if not pd.isna(play["total_away_score"]) else 0,
-            "play": _summarise_play(play["desc"]),
-        }
-        state["score_diff"] = state["home"] - state["away"]
+    Results are clamped to the game window.
+    """
+    first_half = GAME_START_MINUTE + np.trunc(((3600 - game_secs) / 1800) * HALF_DURATION)
+    second_half = _SECOND_HALF_START + np.trunc(((1800 - game_secs) / 1800) * HALF_DURATION)
+    minutes = np.where(game_secs > 1800, first_half, second_half)
+    return np.clip(minutes, GAME_START_MINUTE, _GAME_END_MINUTE).astype(np.int64)
 
-        timeline[wall_min] = state
 
-    return timeline
+def build_game_state_table(plays: pd.DataFrame) -> pd.DataFrame:
+    """Build a columnar per-minute game-state table for any number of games.
+
+    Each play is mapped to its wall minute, the last play of every minute is
+    kept, and that state is forward-filled across the game window. Plays are
+    ordered by ``game_seconds_remaining`` descending within each game with a
+    stable sort, so ties keep the order they were passed in.
+
+    Returns one row per ``(game_id, minute)`` for minutes
+    ``GAME_START_MINUTE`` – ``_GAME_END_MINUTE`` with columns ``has_play``
+    (a play landed on this minute), ``pregame`` (no play yet), ``quarter``,
+    ``clock``, ``clock_seconds_remaining``, ``home``, ``away``, ``score_diff``
+    and ``play``. Pre-game rows hold the kickoff defaults.
+    """
+    game_ids = plays["game_id"].unique()
+    plays = plays.dropna(subset=["game_seconds_remaining"])
+    plays = plays.sort_values(
+        ["game_id", "game_seconds_remaining"], ascending=[True, False], kind="stable"
+    )
+    plays = plays.assign(
+        minute=_wall_minutes(plays["game_seconds_remaining"].to_numpy(dtype=np.float64))
+    )
+    last = plays.groupby(["game_id", "minute"], sort=False).tail(1)
+
+    clock = last["time"].map(_format_clock)
+    states = {
+        "quarter": last["qtr"].astype("Int64").to_numpy(),
+        "clock": clock.to_numpy(dtype=object),
+        "clock_seconds_remaining": clock.map(_clock_seconds).to_numpy(dtype=np.int64),
+        "home": last["total_home_score"].fillna(0).to_numpy(dtype=np.int64),
+        "away": last["total_away_score"].fillna(0).to_numpy(dtype=np.int64),
+        "play": last["desc"].map(_summarise_play).to_numpy(dtype=object),
+    }
+
+    # Forward-fill a pointer to the source play rather than each column, so a
+    # play's missing quarter stays missing instead of inheriting the last one.
+    window = np.arange(GAME_START_MINUTE, _GAME_END_MINUTE + 1)
+    grid = pd.MultiIndex.from_product([game_ids, window], names=["game_id", "minute"])
+    source = (
+        pd.Series(
+            np.arange(len(last), dtype=np.float64),
+            index=pd.MultiIndex.from_arrays([last["game_id"], last["minute"]]),
+        )
+        .reindex(grid)
+    )
+    has_play = source.notna().to_numpy()
+    source = source.groupby(level="game_id").ffill().to_numpy()
+    pregame = np.isnan(source)
+    row = np.where(pregame, 0, source).astype(np.int64)
+
+    def take(name: str, default: Any) -> np.ndarray:
+        values = states[name][row] if len(last) else np.empty(len(row), dtype=object)
+        return np.where(pregame, default, values)
+
+    table = pd.DataFrame({
+        "game_id": grid.get_level_values("game_id"),
+        "minute": grid.get_level_values("minute"),
+        "has_play": has_play,
+        "pregame": pregame,
+        "quarter": pd.array(take("quarter", 1), dtype="Int64"),
+        "clock": take("clock", "15:00"),
+        "clock_seconds_remaining": pd.array(take("clock_seconds_remaining", pd.NA), dtype="Int64"),
+        "home": take("home", 0).astype(np.int64),
+        "away": take("away", 0).astype(np.int64),
+        "play": take("play", "Pre-game"),
+    })
+    table.insert(table.columns.get_loc("play"), "score_diff", table["home"] - table["away"])
+    return table
+
+
+def game_state_maps(table: pd.DataFrame) -> dict[int, dict[int, dict[str, Any] | None]]:
+    """Expand a :func:`build_game_state_table` table into full 1 440-minute dicts.
+
+    Minutes outside the game window are ``None``; consecutive minutes that
+    share a play share one state dict.
+    """
+    result: dict[int, dict[int, dict[str, Any] | None]] = {}
+    columns = {name: table[name].tolist() for name in table.columns}
+    game_ids = table["game_id"].to_numpy()
+    starts = np.flatnonzero(np.r_[True, game_ids[1:] != game_ids[:-1]]).tolist()
+
+    for lo, hi in zip(starts, starts[1:] + [len(table)]):
+        full: dict[int, dict[str, Any] | None] = {m: None for m in range(1440)}
+        state: dict[str, Any] | None = None
+        # Minutes without a play of their own reuse the forward-filled state.
+        for i in range(lo, hi):
+            if columns["pregame"][i]:
+                state = {
+                    "quarter": 1, "clock": "15:00",
+                    "home": 0, "away": 0, "score_diff": 0,
+                    "play": "Pre-game",
+                }
+            elif columns["has_play"][i]:
+                quarter = columns["quarter"][i]
+                state = {
+                    "quarter": None if quarter is pd.NA else quarter,
+                    "clock": columns["clock"][i],
+                    "clock_seconds_remaining": columns["clock_seconds_remaining"][i],
+                    "home": columns["home"][i],
+                    "away": columns["away"][i],
+                    "play": columns["play"][i],
+                    "score_diff": columns["score_diff"][i],
+                }
+            full[columns["minute"][i]] = state
+        result[columns["game_id"][lo]] = full
+    return result
+
+
+def load_game_state_table(game_ids: Iterable[int] | None = None) -> pd.DataFrame:
+    """Per-minute game-state table for *game_ids* (every game when ``None``)."""
+    plays = load_games(NFL_CSV, game_ids, columns=_COLS)
+    return build_game_state_table(plays)
 
 
 def load_nfl_game_states() -> dict[str, dict[int, dict[str, Any] | None]]:
@@ -123,7 +213,7 @@ def load_nfl_game_states() -> dict[str, dict[int, dict[str, Any] | None]]:
     Returns ``{scenario_id: {minute: game_state_or_None}}`` where minutes
     outside the game window are ``None``.
     """
-    df = pd.read_csv(NFL_CSV, usecols=_COLS, encoding="utf-8-sig")
+    df = load_games(NFL_CSV, GAME_MAPPING.values(), columns=_COLS)
     result: dict[str, dict[int, dict[str, Any] | None]] = {}
 
     for scenario_id, game_id in GAME_MAPPING.items():
@@ -137,31 +227,14 @@ def load_nfl_game_states() -> dict[str, dict[int, dict[str, Any] | None]]:
             continue
 
         away_team = game_df.iloc[0]["away_team"]
-        game_timeline = _build_game_timeline(game_df)
-
-        full: dict[int, dict[str, Any] | None] = {}
-        last_state: dict[str, Any] | None = None
-        for minute in range(1440):
-            if minute in game_timeline:
-                last_state = game_timeline[minute]
-            if minute < GAME_START_MINUTE or minute > _GAME_END_MINUTE:
-                full[minute] = None
-            elif last_state is not None:
-                full[minute] = last_state
-            else:
-                full[minute] = {
-                    "quarter": 1, "clock": "15:00",
-                    "home": 0, "away": 0, "score_diff": 0,
-                    "play": "Pre-game",
-                }
-            full[minute]  # ensure key exists
-        result[scenario_id] = full
+        table = build_game_state_table(game_df)
+        result[scenario_id] = game_state_maps(table)[game_id]
 
         final = game_df.iloc[-1]
         home_final = int(final["total_home_score"]) if not pd.isna(final["total_home_score"]) else "?"
         away_final = int(final["total_away_score"]) if not pd.isna(final["total_away_score"]) else "?"
         print(f"  {scenario_id}: SEA {home_final} - {away_final} {away_team} "
-              f"({len(game_timeline)} play-minutes mapped)")
+              f"({int(table['has_play'].sum())} play-minutes mapped)")
 
     return result
 
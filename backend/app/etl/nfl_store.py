@@ -0,0 +1,183 @@
+"""Game-partitioned store for the NFL play-by-play CSV.
+
+The 2009–2018 play-by-play CSV is parsed once and split into one ``.npz`` file
+per ``game_id`` plus a small ``index.json``, so loaders that need a handful of
+games read only those files instead of the whole CSV. The store is rebuilt only
+when the CSV's checksum changes; a size/mtime fingerprint is checked first so
+an unchanged CSV is not re-hashed on every load.
+
+String columns are stored as fixed-width unicode arrays with a ``<col>__na``
+mask, so no pickles are involved and missing values round-trip as NaN.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+from collections.abc import Iterable
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+STORE_FORMAT_VERSION = 1
+NFL_STORE_DIR = Path(
+    os.getenv("NFL_STORE_DIR", "").strip()
+    or Path(__file__).resolve().parents[2] / "data" / "nfl_store"
+)
+
+# Union of the columns used by app.etl.nfl_data and app.ml.train.
+STORE_COLUMNS = [
+    "game_id", "qtr", "time", "game_seconds_remaining",
+    "total_home_score", "total_away_score",
+    "desc", "play_type", "home_team", "away_team",
+    "touchdown", "interception", "fumble_lost",
+    "score_differential", "epa",
+]
+
+_INDEX_FILE = "index.json"
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _fingerprint(path: Path) -> dict[str, int]:
+    stat = path.stat()
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def _read_index(store_dir: Path) -> dict[str, Any] | None:
+    index_path = store_dir / _INDEX_FILE
+    if not index_path.exists():
+        return None
+    index = json.loads(index_path.read_text(encoding="utf-8"))
+    if index.get("format_version") != STORE_FORMAT_VERSION:
+        return None
+    return index
+
+
+def _encode_game(game_df: pd.DataFrame) -> dict[str, np.ndarray]:
+    arrays: dict[str, np.ndarray] = {}
+    for column in game_df.columns:
+        series = game_df[column]
+        if not pd.api.types.is_numeric_dtype(series.dtype):
+            missing = series.isna().to_numpy()
+            arrays[column] = series.fillna("").astype(str).to_numpy(dtype=str)
+            if missing.any():
+                arrays[f"{column}__na"] = missing
+        else:
+            arrays[column] = series.to_numpy()
+    return arrays
+
+
+def _decode_game(arrays: Any, columns: list[str]) -> dict[str, np.ndarray]:
+    decoded: dict[str, np.ndarray] = {}
+    for column in columns:
+        values = arrays[column]
+        if values.dtype.kind == "U":
+            values = values.astype(object)
+            mask_key = f"{column}__na"
+            if mask_key in arrays.files:
+                values[arrays[mask_key]] = np.nan
+        decoded[column] = values
+    return decoded
+
+
+def build_nfl_store(csv_path: Path, store_dir: Path = NFL_STORE_DIR) -> dict[str, Any]:
+    """Parse *csv_path* once and write the per-game partitions and index."""
+    print(f"Building NFL play-by-play store from {csv_path} …")
+    checksum = _sha256(csv_path)
+    df = pd.read_csv(csv_path, usecols=STORE_COLUMNS, encoding="utf-8-sig", low_memory=False)
+
+    staging = store_dir.with_name(f".{store_dir.name}.tmp")
+    if staging.exists():
+        shutil.rmtree(staging)
+    staging.mkdir(parents=True)
+
+    games: dict[str, dict[str, Any]] = {}
+    # sort=False keeps each game's plays in CSV order.
+    for game_id, game_df in df.groupby("game_id", sort=False):
+        filename = f"{int(game_id)}.npz"
+        np.savez(staging / filename, **_encode_game(game_df))
+        games[str(int(game_id))] = {"file": filename, "plays": len(game_df)}
+
+    index = {
+        "format_version": STORE_FORMAT_VERSION,
+        "source": str(csv_path),
+        "sha256": checksum,
+        **_fingerprint(csv_path),
+        "columns": list(df.columns),
+        "plays": len(df),
+        "games": games,
+    }
+    (staging / _INDEX_FILE).write_text(json.dumps(index), encoding="utf-8")
+
+    if store_dir.exists():
+        shutil.rmtree(store_dir)
+    staging.rename(store_dir)
+    print(f"  {len(df):,} plays across {len(games):,} games -> {store_dir}")
+    return index
+
+
+def ensure_nfl_store(csv_path: Path, store_dir: Path = NFL_STORE_DIR) -> dict[str, Any]:
+    """Return the store index, (re)building it only if the CSV changed.
+
+    If the CSV is absent but a store exists, the store is used as-is.
+    """
+    index = _read_index(store_dir)
+    if not csv_path.exists():
+        if index is None:
+            raise FileNotFoundError(f"NFL play-by-play CSV not found at {csv_path}")
+        return index
+    if index is None:
+        return build_nfl_store(csv_path, store_dir)
+
+    fingerprint = _fingerprint(csv_path)
+    if all(index.get(key) == value for key, value in fingerprint.items()):
+        return index
+    if _sha256(csv_path) != index.get("sha256"):
+        return build_nfl_store(csv_path, store_dir)
+    # Touched but unchanged: remember the new fingerprint to skip re-hashing.
+    index.update(fingerprint)
+    (store_dir / _INDEX_FILE).write_text(json.dumps(index), encoding="utf-8")
+    return index
+
+
+def load_games(
+    csv_path: Path,
+    game_ids: Iterable[int] | None = None,
+    columns: list[str] | None = None,
+    store_dir: Path = NFL_STORE_DIR,
+) -> pd.DataFrame:
+    """Return plays for *game_ids* (all games when ``None``) from the store.
+
+    Rows keep CSV order within and across the requested games. Unknown game
+    ids are skipped, matching a ``df[df["game_id"] == id]`` filter.
+    """
+    index = ensure_nfl_store(csv_path, store_dir)
+    columns = columns or index["columns"]
+    missing = [column for column in columns if column not in index["columns"]]
+    if missing:
+        raise KeyError(f"Columns not in NFL store: {', '.join(missing)}")
+
+    keys = list(index["games"]) if game_ids is None else [str(int(g)) for g in game_ids]
+    parts: dict[str, list[np.ndarray]] = {column: [] for column in columns}
+    for key in keys:
+        entry = index["games"].get(key)
+        if entry is None:
+            continue
+        with np.load(store_dir / entry["file"]) as arrays:
+            for column, values in _decode_game(arrays, columns).items():
+                parts[column].append(values)
+
+    if not parts[columns[0]]:
+        return pd.DataFrame({column: pd.Series(dtype=object) for column in columns})
+    return pd.DataFrame({column: np.concatenate(values) for column, values in parts.items()})
@@ -10,18 +10,32 @@ from __future__ import annotations
 
 import asyncio
 import math
+from collections.abc import Iterator
+from itertools import islice
 from pathlib import Path
 
 import numpy as np
 import pandas as pd
-from sqlalchemy import delete
+from sqlalchemy import delete, insert
+from sqlalchemy.ext.asyncio import AsyncConnection
 
 from app.db.models import TransitCache
-from app.db.session import AsyncSessionLocal, init_db
+from app.db.session import engine, init_db
 from app.etl.scenarios import SCENARIOS
 
 PROJECT_ROOT = Path(__file__).resolve().parents[3]
 
+# Rows per executemany batch during bulk ingest.
+INGEST_BATCH_SIZE = 10_000
+# Settings used only while bulk-loading SQLite; the values read beforehand are
+# restored afterwards, including the database's journal mode.
+_SQLITE_INGEST_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "OFF",
+    "cache_size": "-262144",
+    "temp_store": "MEMORY",
+}
+
 
 def _resolve_data_file(filename: str) -> Path:
     candidates = [
@@ -166,39 +180,162 @@ def _event_multiplier(minute: int, cfg: dict, proximity: float) -> float:
 
 
 # ---------------------------------------------------------------------------
-# Row builder
+# Vectorised timeline builder
 # ---------------------------------------------------------------------------
 
-def _build_scenario_rows(
-    scenario_id: str,
+def _smooth_array(t: np.ndarray) -> np.ndarray:
+    """Element-wise ``_smooth``.
+
+    Cosines go through ``math.cos`` (not ``np.cos``, whose SIMD kernels may
+    differ in the last ulp) so results match the scalar path bit for bit; all
+    the remaining arithmetic is vectorised.
+    """
+    clipped = np.clip(t, 0.0, 1.0).ravel()
+    cos = np.fromiter(
+        (math.cos(math.pi * x) for x in clipped.tolist()), dtype=np.float64, count=clipped.size
+    )
+    return (0.5 * (1.0 - cos)).reshape(np.shape(t))
+
+
+def _event_levels(cfg: dict) -> np.ndarray:
+    """Un-scaled event level per minute (``raw`` in ``_event_multiplier``).
+
+    Minutes outside the event window are 1.0, so scaling by proximity leaves
+    them at exactly 1.0 as in the scalar path.
+    """
+    minute = np.arange(1440, dtype=np.float64)
+    arrival_start = GAME_START - ARRIVAL_WINDOW
+    egress_start = cfg["early_exit"] if cfg["early_exit"] is not None else GAME_END
+    egress_end = egress_start + cfg["postgame_decay"]
+    peak_frac = 0.20
+
+    arrival = 1.0 + (cfg["pregame_peak"] - 1.0) * _smooth_array(
+        (minute - arrival_start) / ARRIVAL_WINDOW
+    )
+    settle = cfg["pregame_peak"] + (cfg["during_game"] - cfg["pregame_peak"]) * _smooth_array(
+        (minute - GAME_START) / SETTLE_TIME
+    )
+    during = np.where(minute < GAME_START + SETTLE_TIME, settle, cfg["during_game"])
+
+    t = (minute - egress_start) / cfg["postgame_decay"]
+    surge = cfg["during_game"] + (cfg["postgame_peak"] - cfg["during_game"]) * _smooth_array(
+        t / peak_frac
+    )
+    decay = cfg["postgame_peak"] + (1.0 - cfg["postgame_peak"]) * _smooth_array(
+        (t - peak_frac) / (1.0 - peak_frac)
+    )
+    egress = np.where(t <= peak_frac, surge, decay)
+
+    # Same branch precedence as _event_multiplier.
+    return np.select(
+        [minute < arrival_start, minute < GAME_START, minute < egress_start, minute <= egress_end],
+        [1.0, arrival, during, egress],
+        default=1.0,
+    )
+
+
+def build_event_multipliers(
+    scenario_ids: list[str],
+    proximity: np.ndarray,
+) -> np.ndarray:
+    """Return the ``(scenarios, 1440, corridors)`` multiplier tensor.
+
+    Vectorised equivalent of calling ``_event_multiplier`` for every scenario,
+    minute and corridor proximity.
+    """
+    levels = np.stack([_event_levels(SCENARIO_PROFILES[sid]) for sid in scenario_ids])
+    return 1.0 + (levels[:, :, np.newaxis] - 1.0) * np.asarray(proximity, dtype=np.float64)
+
+
+def build_transit_matrices(
+    scenario_ids: list[str],
     profile: np.ndarray,
-) -> list[TransitCache]:
-    """Generate ``TransitCache`` objects for every minute × corridor."""
-    cfg = SCENARIO_PROFILES[scenario_id]
-    rows: list[TransitCache] = []
-
-    for loc_id, corridor in CORRIDORS.items():
-        awdt = corridor["awdt"]
-        ped_ratio = corridor["ped_ratio"]
-        prox = corridor["proximity"]
-
-        for minute in range(1440):
-            base = awdt * profile[minute]
-            mult = _event_multiplier(minute, cfg, prox)
-            transit_load = max(1, int(base * mult))
-            pedestrian_volume = max(1, int(base * mult * ped_ratio))
-
-            rows.append(
-                TransitCache(
-                    scenario_id=scenario_id,
-                    minute=minute,
-                    location_id=loc_id,
-                    transit_load=transit_load,
-                    pedestrian_volume=pedestrian_volume,
-                )
-            )
-
-    return rows
+    corridors: dict[str, dict] = CORRIDORS,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Compute ``(transit_load, pedestrian_volume)`` for every scenario at once.
+
+    Both arrays are ``int64`` with shape ``(scenarios, 1440, corridors)``, the
+    corridor axis following ``corridors`` order.
+    """
+    awdt = np.array([c["awdt"] for c in corridors.values()], dtype=np.float64)
+    ped_ratio = np.array([c["ped_ratio"] for c in corridors.values()], dtype=np.float64)
+    proximity = np.array([c["proximity"] for c in corridors.values()], dtype=np.float64)
+
+    base = profile[:, np.newaxis] * awdt  # (1440, corridors)
+    load = base * build_event_multipliers(scenario_ids, proximity)
+    transit_load = np.maximum(1, load.astype(np.int64))
+    pedestrian_volume = np.maximum(1, (load * ped_ratio).astype(np.int64))
+    return transit_load, pedestrian_volume
+
+
+# ---------------------------------------------------------------------------
+# Row builder
+# ---------------------------------------------------------------------------
+
+def _iter_transit_rows(
+    scenario_ids: list[str],
+    transit_load: np.ndarray,
+    pedestrian_volume: np.ndarray,
+) -> Iterator[dict]:
+    """Yield ``transit_cache`` row dicts for every scenario × corridor × minute."""
+    for s, scenario_id in enumerate(scenario_ids):
+        loads = transit_load[s].T.tolist()
+        volumes = pedestrian_volume[s].T.tolist()
+        for c, loc_id in enumerate(CORRIDORS):
+            for minute in range(1440):
+                yield {
+                    "scenario_id": scenario_id,
+                    "minute": minute,
+                    "location_id": loc_id,
+                    "transit_load": loads[c][minute],
+                    "pedestrian_volume": volumes[c][minute],
+                }
+
+
+async def _bulk_load_transit_cache(conn: AsyncConnection, rows: Iterator[dict]) -> int:
+    """Replace all ``transit_cache`` rows with *rows* in a single transaction.
+
+    Rows go in through Core executemany in ``INGEST_BATCH_SIZE`` batches. On
+    SQLite the load runs in WAL mode with ``synchronous=OFF`` and a larger page
+    cache, and the secondary indexes are dropped for the load and rebuilt once
+    at the end; the previous settings are restored afterwards. A failed load
+    rolls back to the previous contents.
+    """
+    is_sqlite = conn.dialect.name == "sqlite"
+    indexes = list(TransitCache.__table__.indexes)
+    previous: dict[str, object] = {}
+    if is_sqlite:
+        # Connection-level settings must be changed outside a transaction.
+        for name, value in _SQLITE_INGEST_PRAGMAS.items():
+            previous[name] = (await conn.exec_driver_sql(f"PRAGMA {name}")).scalar()
+            await conn.exec_driver_sql(f"PRAGMA {name}={value}")
+        await conn.commit()
+
+    total = 0
+    try:
+        print("Clearing existing transit_cache rows …")
+        await conn.execute(delete(TransitCache))
+        for index in indexes:
+            await conn.run_sync(lambda sync_conn, index=index: index.drop(sync_conn, checkfirst=True))
+
+        statement = insert(TransitCache)
+        while batch := list(islice(rows, INGEST_BATCH_SIZE)):
+            await conn.execute(statement, batch)
+            total += len(batch)
+
+        print("  Building transit_cache indexes …")
+        for index in indexes:
+            await conn.run_sync(lambda sync_conn, index=index: index.create(sync_conn))
+        await conn.commit()
+    except BaseException:
+        await conn.rollback()
+        raise
+    finally:
+        if is_sqlite:
+            for name, value in previous.items():
+                await conn.exec_driver_sql(f"PRAGMA {name}={value}")
+            await conn.commit()
+    return total
 
 
 # ---------------------------------------------------------------------------
@@ -206,23 +343,21 @@ def _build_scenario_rows(
 # ---------------------------------------------------------------------------
 
 async def ingest_seattle_traffic_data() -> None:
-    """Load traffic CSVs, build game-day timelines, populate transit_cache."""
+    """Load traffic CSVs, build game-day timelines, bulk-load transit_cache."""
     await init_db()
 
     print("Loading hourly traffic profile from 15-min bin data …")
     profile = _load_hourly_profile()
 
-    async with AsyncSessionLocal() as session:
-        print("Clearing existing transit_cache rows …")
-        await session.execute(delete(TransitCache))
-        await session.commit()
-
-        for scenario_id in SCENARIOS:
-            print(f"  Building {scenario_id} …")
-            rows = _build_scenario_rows(scenario_id, profile)
-            session.add_all(rows)
-            await session.commit()
-            print(f"    -> {len(rows):,} rows inserted")
+    scenario_ids = list(SCENARIOS)
+    print(f"  Building {len(scenario_ids)} scenarios × {len(CORRIDORS)} corridors …")
+    transit_load, pedestrian_volume = build_transit_matrices(scenario_ids, profile)
+
+    async with engine.connect() as conn:
+        inserted = await _bulk_load_transit_cache(
+            conn, _iter_transit_rows(scenario_ids, transit_load, pedestrian_volume)
+        )
+    print(f"    -> {inserted:,} rows inserted")
 
     print("Transit cache populated successfully.")
 
@@ -7,8 +7,12 @@ Used by the heuristic predictor today and by the XGBoost model when trained.
 from __future__ import annotations
 
 import math
+from collections.abc import Sequence
 from typing import Any
 
+import numpy as np
+import pandas as pd
+
 # ---------------------------------------------------------------------------
 # Game-state feature names (used by predictor.py)
 # ---------------------------------------------------------------------------
@@ -24,6 +28,12 @@ TRAFFIC_FEATURES = (
     "max_corridor_saturation",
 )
 
+FEATURE_NAMES = GAME_FEATURES + TRAFFIC_FEATURES
+
+# Feature values used when there is no game state / no transit context.
+_NO_GAME_FEATURES = (0.0, 60.0, 0.0, 0.0, 0.0)
+_NO_TRAFFIC_FEATURES = (0.0, 0.0, 1.0, 1.0)
+
 
 def make_feature_vector(
     game_state: dict[str, Any] | None,
@@ -126,3 +136,139 @@ def make_feature_vector(
         out["max_corridor_saturation"] = 1.0
 
     return out
+
+
+# ---------------------------------------------------------------------------
+# Batch feature matrix (shared by train.py and predictor.py)
+# ---------------------------------------------------------------------------
+
+def game_state_columns(game_states: Sequence[dict[str, Any] | None]) -> dict[str, np.ndarray]:
+    """Columnar game state for :func:`build_feature_matrix` from per-minute dicts.
+
+    ``None`` or empty states (outside the game window) get ``in_game=False``.
+    """
+    n = len(game_states)
+    columns = {
+        "in_game": np.zeros(n, dtype=bool),
+        "quarter": np.full(n, np.nan),
+        "clock_seconds_remaining": np.full(n, np.nan),
+        "home": np.full(n, np.nan),
+        "away": np.full(n, np.nan),
+        "momentum_raw": np.full(n, np.nan),
+    }
+    for i, state in enumerate(game_states):
+        if not state:
+            continue
+        columns["in_game"][i] = True
+        for name in ("quarter", "clock_seconds_remaining", "home", "away", "momentum_raw"):
+            value = state.get(name)
+            if value is not None:
+                columns[name][i] = value
+    return columns
+
+
+def _game_column(game_state: Any, name: str, default: float, n: int) -> np.ndarray:
+    if name not in game_state:
+        return np.full(n, default)
+    values = pd.Series(game_state[name]).to_numpy(dtype=np.float64, na_value=np.nan)
+    return np.where(np.isnan(values), default, values)
+
+
+def build_feature_matrix(
+    game_state: pd.DataFrame | dict[str, Any],
+    transit_load: np.ndarray | None = None,
+    pedestrian_volume: np.ndarray | None = None,
+    transit_baseline: np.ndarray | None = None,
+    pedestrian_baseline: np.ndarray | None = None,
+    dtype: Any = np.float32,
+) -> np.ndarray:
+    """Build an ``(n, len(FEATURE_NAMES))`` matrix; the batch form of :func:`make_feature_vector`.
+
+    Args:
+        game_state: Columnar game state, e.g. ``nfl_data.build_game_state_table``
+            or :func:`game_state_columns`: ``quarter``, ``home``, ``away`` and
+            optionally ``clock_seconds_remaining``, ``momentum_raw`` and
+            ``in_game`` (False rows get the no-game defaults). Missing values
+            fall back to the same defaults as absent dict keys.
+        transit_load, pedestrian_volume: Optional minutes x corridors matrices
+            for the same rows. NaN marks a corridor with no reading; a row with
+            no readings gets the neutral traffic defaults.
+        transit_baseline, pedestrian_baseline: Optional baseline per corridor,
+            shape ``(corridors,)`` or minutes x corridors. When given, surge
+            ratio and per-corridor saturation max are computed.
+        dtype: Output dtype. float32 keeps large training sets compact; pass
+            float64 where results must match :func:`make_feature_vector` exactly.
+    """
+    n = len(game_state["quarter"])
+    in_game = (
+        _game_column(game_state, "in_game", 1.0, n).astype(bool)
+        if "in_game" in game_state
+        else np.ones(n, dtype=bool)
+    )
+    quarter = _game_column(game_state, "quarter", 1.0, n)
+    clock_secs = _game_column(game_state, "clock_seconds_remaining", 900.0, n)
+    home = _game_column(game_state, "home", 0.0, n)
+    away = _game_column(game_state, "away", 0.0, n)
+    momentum_raw = _game_column(game_state, "momentum_raw", 0.0, n)
+
+    out = np.empty((n, len(FEATURE_NAMES)), dtype=dtype)
+
+    # ----- Game-state features -----
+    minutes_remaining = np.maximum(0.0, ((4 - quarter) * 15) + (clock_secs / 60.0))
+    score_diff = home - away
+    quarter_weight = np.where(quarter >= 4, 2.0, 1.0)
+    game = out[:, : len(GAME_FEATURES)]
+    game[:, 0] = score_diff
+    game[:, 1] = minutes_remaining
+    game[:, 2] = np.tanh(momentum_raw)
+    game[:, 3] = (quarter >= 3) & (score_diff <= -14)
+    game[:, 4] = np.where(
+        minutes_remaining <= 0,
+        0.0,
+        np.minimum(1.0, (minutes_remaining / 60.0) * quarter_weight),
+    )
+    game[~in_game] = _NO_GAME_FEATURES
+
+    # ----- Traffic features (optional) -----
+    traffic = out[:, len(GAME_FEATURES):]
+    traffic[:] = _NO_TRAFFIC_FEATURES
+    if transit_load is None and pedestrian_volume is None:
+        return out
+
+    shape = np.shape(transit_load if transit_load is not None else pedestrian_volume)
+    load = np.full(shape, np.nan) if transit_load is None else np.asarray(transit_load, dtype=np.float64)
+    ped = np.full(shape, np.nan) if pedestrian_volume is None else np.asarray(pedestrian_volume, dtype=np.float64)
+    present = ~(np.isnan(load) & np.isnan(ped))
+    has_context = present.any(axis=1)
+    load = np.nan_to_num(load)
+    ped = np.nan_to_num(ped)
+    total_transit = load.sum(axis=1)
+    total_ped = ped.sum(axis=1)
+
+    values = np.empty((n, len(TRAFFIC_FEATURES)))
+    values[:, 0] = total_transit
+    values[:, 1] = total_ped
+    values[:, 2:] = 1.0
+    if transit_baseline is not None or pedestrian_baseline is not None:
+        base_load = np.broadcast_to(
+            np.nan_to_num(np.asarray(transit_baseline if transit_baseline is not None else 0.0, dtype=np.float64)),
+            shape,
+        )
+        base_ped = np.broadcast_to(
+            np.nan_to_num(np.asarray(pedestrian_baseline if pedestrian_baseline is not None else 0.0, dtype=np.float64)),
+            shape,
+        )
+        base_transit = base_load.sum(axis=1)
+        base_pedestrian = base_ped.sum(axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ratio_transit = np.where(base_transit > 0, total_transit / base_transit, 1.0)
+            ratio_ped = np.where(base_pedestrian > 0, total_ped / base_pedestrian, 1.0)
+        values[:, 2] = np.maximum(ratio_transit, ratio_ped)
+        # Per-corridor saturation: max of (current / baseline) over corridors
+        saturation = np.maximum(
+            load / np.where(base_load == 0, 1.0, base_load),
+            ped / np.where(base_ped == 0, 1.0, base_ped),
+        )
+        values[:, 3] = np.where(present, saturation, -np.inf).max(axis=1)
+    traffic[has_context] = values[has_context]
+    return out
@@ -0,0 +1,199 @@
+"""Parallel, early-stopping hyperparameter search for the egress models.
+
+Trials for every target are sampled up front (the same ``ParameterSampler``
+draws ``RandomizedSearchCV`` would make) and run together in one process
+pool. Each worker is capped to a few BLAS/OpenMP threads so the workers do not
+oversubscribe the machine. Every trial fits XGBoost's ``hist`` trees with early
+stopping on a slice held out from each CV fold's training part, so
+``n_estimators`` from the grid is only an upper bound.
+
+Finished trials are appended to a JSON-lines checkpoint named after a
+fingerprint of the training data and search settings; rerunning the same
+search skips the trials already recorded there.
+
+Optional sample weights (see ``train.deduplicate_samples``) are applied to
+fitting, early stopping and CV scoring alike.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+from sklearn.metrics import r2_score
+from sklearn.model_selection import KFold, ParameterSampler
+from xgboost import XGBRegressor
+
+SEARCH_CHECKPOINT_DIR = Path(__file__).resolve().parents[2] / "data" / "search_checkpoints"
+
+EARLY_STOPPING_ROUNDS = 20
+# Share of each fold's training rows held out to decide when to stop adding trees.
+EARLY_STOPPING_FRACTION = 0.1
+RANDOM_STATE = 42
+
+_WORKER: dict[str, Any] = {}
+
+
+def _init_worker(X: np.ndarray, targets: dict[str, np.ndarray], weights: np.ndarray,
+                 cv: int, threads: int) -> None:
+    from threadpoolctl import threadpool_limits
+
+    _WORKER.update(
+        X=X, targets=targets, weights=weights, cv=cv, threads=threads,
+        limits=threadpool_limits(threads),
+    )
+
+
+def _run_trial(target: str, index: int, params: dict[str, Any]) -> dict[str, Any]:
+    X, y, w = _WORKER["X"], _WORKER["targets"][target], _WORKER["weights"]
+    started = time.perf_counter()
+    scores: list[float] = []
+    trees: list[int] = []
+    for fit_idx, val_idx in KFold(n_splits=_WORKER["cv"]).split(X):
+        n_stop = max(1, int(len(fit_idx) * EARLY_STOPPING_FRACTION))
+        fit_idx, stop_idx = fit_idx[:-n_stop], fit_idx[-n_stop:]
+        model = XGBRegressor(
+            **params,
+            tree_method="hist",
+            early_stopping_rounds=EARLY_STOPPING_ROUNDS,
+            n_jobs=_WORKER["threads"],
+            random_state=RANDOM_STATE,
+            verbosity=0,
+        )
+        model.fit(
+            X[fit_idx], y[fit_idx],
+            sample_weight=w[fit_idx],
+            eval_set=[(X[stop_idx], y[stop_idx])],
+            sample_weight_eval_set=[w[stop_idx]],
+            verbose=False,
+        )
+        scores.append(float(
+            r2_score(y[val_idx], model.predict(X[val_idx]), sample_weight=w[val_idx])
+        ))
+        trees.append(int(model.best_iteration) + 1)
+    return {
+        "target": target,
+        "trial": index,
+        "params": params,
+        "score": float(np.mean(scores)),
+        "n_estimators": int(round(np.mean(trees))),
+        "seconds": time.perf_counter() - started,
+    }
+
+
+def _fingerprint(X: np.ndarray, targets: dict[str, np.ndarray], weights: np.ndarray,
+                 settings: dict[str, Any]) -> str:
+    digest = hashlib.sha256()
+    digest.update(np.ascontiguousarray(X).tobytes())
+    digest.update(np.ascontiguousarray(weights).tobytes())
+    for name in sorted(targets):
+        digest.update(name.encode())
+        digest.update(np.ascontiguousarray(targets[name]).tobytes())
+    digest.update(json.dumps(settings, sort_keys=True, default=str).encode())
+    return digest.hexdigest()[:16]
+
+
+def _read_checkpoint(path: Path) -> dict[tuple[str, int], dict[str, Any]]:
+    done: dict[tuple[str, int], dict[str, Any]] = {}
+    if not path.exists():
+        return done
+    for line in path.read_text(encoding="utf-8").splitlines():
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            continue  # partial line from an interrupted run
+        done[(record["target"], record["trial"])] = record
+    return done
+
+
+def parallel_search(
+    X: np.ndarray,
+    targets: dict[str, np.ndarray],
+    param_grid: dict[str, list[Any]],
+    n_iter: int,
+    seeds: dict[str, int],
+    cv: int = 3,
+    max_workers: int | None = None,
+    threads_per_worker: int | None = None,
+    checkpoint_dir: Path = SEARCH_CHECKPOINT_DIR,
+    sample_weight: np.ndarray | None = None,
+) -> dict[str, dict[str, Any]]:
+    """Search every target in *targets* concurrently; return the best trial per target.
+
+    Each result holds ``params`` (with ``n_estimators`` replaced by the mean
+    early-stopped tree count), the mean CV ``score`` (R²) and ``trials``.
+    """
+    weights = np.ones(len(X)) if sample_weight is None else np.asarray(sample_weight, dtype=np.float64)
+    trials = [
+        (target, index, params)
+        for target in targets
+        for index, params in enumerate(
+            ParameterSampler(param_grid, n_iter=n_iter, random_state=seeds[target])
+        )
+    ]
+    settings = {
+        "trials": trials,
+        "cv": cv,
+        "early_stopping_rounds": EARLY_STOPPING_ROUNDS,
+        "early_stopping_fraction": EARLY_STOPPING_FRACTION,
+        "random_state": RANDOM_STATE,
+    }
+    checkpoint_dir.mkdir(parents=True, exist_ok=True)
+    checkpoint = checkpoint_dir / f"search_{_fingerprint(X, targets, weights, settings)}.jsonl"
+    done = _read_checkpoint(checkpoint)
+    # Drop any partial line left by an interrupted run before appending to it.
+    checkpoint.write_text(
+        "".join(json.dumps(record) + "\n" for record in done.values()), encoding="utf-8"
+    )
+    pending = [trial for trial in trials if (trial[0], trial[1]) not in done]
+
+    cpus = os.cpu_count() or 1
+    workers = max(1, min(max_workers or cpus, len(pending) or 1))
+    threads = threads_per_worker or max(1, cpus // workers)
+    print(f"  {len(trials)} trials ({len(done)} resumed from {checkpoint.name}); "
+          f"{workers} workers x {threads} threads")
+
+    best: dict[str, float] = {}
+    for record in done.values():
+        best[record["target"]] = max(best.get(record["target"], -np.inf), record["score"])
+
+    started = time.perf_counter()
+    if pending:
+        with (
+            ProcessPoolExecutor(
+                max_workers=workers, initializer=_init_worker, initargs=(X, targets, weights, cv, threads)
+            ) as pool,
+            open(checkpoint, "a", encoding="utf-8") as log_file,
+        ):
+            futures = [pool.submit(_run_trial, *trial) for trial in pending]
+            for future in as_completed(futures):
+                record = future.result()
+                log_file.write(json.dumps(record) + "\n")
+                log_file.flush()
+                done[(record["target"], record["trial"])] = record
+                target = record["target"]
+                best[target] = max(best.get(target, -np.inf), record["score"])
+                print(f"  [{target} {record['trial'] + 1:>2}/{n_iter}] "
+                      f"R² {record['score']:.4f} (best {best[target]:.4f}), "
+                      f"{record['n_estimators']} trees, {record['seconds']:.1f} s")
+    print(f"  Search wall time: {time.perf_counter() - started:.1f} s")
+
+    results: dict[str, dict[str, Any]] = {}
+    for target in targets:
+        records = sorted(
+            (record for record in done.values() if record["target"] == target),
+            key=lambda record: record["trial"],
+        )
+        top = max(records, key=lambda record: record["score"])
+        results[target] = {
+            "params": {**top["params"], "n_estimators": top["n_estimators"]},
+            "score": top["score"],
+            "trials": records,
+        }
+    return results
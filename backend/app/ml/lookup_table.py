@@ -0,0 +1,213 @@
+"""Compiled lookup-table form of the egress model bundle.
+
+The egress models take a handful of low-cardinality features, so both
+regressors can be evaluated once over a dense feature grid and served by array
+indexing with multilinear interpolation. A compiled bundle exposes the same
+``predict(X)`` interface as the XGBoost models, so ``predictor.py`` uses it
+unchanged, and it is saved as a plain ``.npz`` that loads with numpy alone.
+
+Usage (compile next to the trained model and print the validation report):
+    cd backend && ../venv/bin/python3 -m app.ml.lookup_table
+"""
+
+from __future__ import annotations
+
+import hashlib
+import itertools
+import json
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from app.ml.features import FEATURE_NAMES, build_feature_matrix
+
+LOOKUP_FORMAT_VERSION = 1
+_MODEL_KEYS = ("threat_model", "crowd_model")
+
+# Grid axes per feature. Real minutes_remaining values are multiples of 1/60,
+# so interpolation error concentrates near tree splits between grid points.
+DEFAULT_GRID: dict[str, np.ndarray] = {
+    "score_diff": np.arange(-60.0, 61.0, 1.0),
+    "minutes_remaining": np.linspace(0.0, 60.0, 241),
+    "momentum": np.array([-1.0, 0.0, 1.0]),
+    "blowout_indicator": np.array([0.0, 1.0]),
+    "time_pressure": np.linspace(0.0, 1.0, 21),
+}
+
+
+class LookupTable:
+    """One model output tabulated over a rectilinear grid."""
+
+    def __init__(self, axes: list[np.ndarray], values: np.ndarray) -> None:
+        self.axes = axes
+        self.values = values
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        """Multilinear interpolation; inputs outside the grid are clamped to its edges."""
+        X = np.asarray(X, dtype=np.float64)
+        flat = self.values.reshape(-1)
+        strides = np.cumprod([1, *[len(axis) for axis in self.axes[:0:-1]]])[::-1]
+        base = np.zeros(len(X), dtype=np.intp)
+        # Axes where every input sits on a grid node (e.g. the blowout flag)
+        # contribute a single corner instead of two.
+        interpolated: list[tuple[int, np.ndarray]] = []
+        for d, axis in enumerate(self.axes):
+            x = np.clip(X[:, d], axis[0], axis[-1])
+            if len(axis) == 1:
+                continue
+            lo = np.clip(np.searchsorted(axis, x, side="right") - 1, 0, len(axis) - 2)
+            t = (x - axis[lo]) / (axis[lo + 1] - axis[lo])
+            base += lo * strides[d]
+            if t.any():
+                interpolated.append((int(strides[d]), t))
+
+        out = np.zeros(len(X))
+        for corner in itertools.product((0, 1), repeat=len(interpolated)):
+            weight = np.ones(len(X))
+            offset = 0
+            for step, (stride, t) in zip(corner, interpolated):
+                weight *= t if step else 1.0 - t
+                offset += step * stride
+            out += weight * flat[base + offset]
+        return out.astype(np.float32)
+
+
+def model_checksum(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def compile_lookup_tables(
+    bundle: dict[str, Any], grid: dict[str, np.ndarray] | None = None
+) -> dict[str, Any]:
+    """Evaluate both models over *grid* and return a bundle of lookup tables."""
+    grid = grid or DEFAULT_GRID
+    feature_names = list(bundle["feature_names"])
+    missing = [name for name in feature_names if name not in grid]
+    if missing:
+        raise ValueError(f"No lookup grid for features: {', '.join(missing)}")
+    axes = [np.asarray(grid[name], dtype=np.float64) for name in feature_names]
+
+    # One predict call per slice of the first axis keeps the mesh small.
+    rest = np.stack(np.meshgrid(*axes[1:], indexing="ij"), axis=-1).reshape(-1, len(axes) - 1)
+    compiled: dict[str, Any] = {
+        "feature_names": feature_names,
+        "stadium_capacity": bundle.get("stadium_capacity"),
+    }
+    for key in _MODEL_KEYS:
+        values = np.empty((len(axes[0]), len(rest)), dtype=np.float32)
+        for i, value in enumerate(axes[0]):
+            mesh = np.column_stack([np.full(len(rest), value), rest])
+            values[i] = bundle[key].predict(mesh)
+        compiled[key] = LookupTable(axes, values.reshape([len(axis) for axis in axes]))
+    return compiled
+
+
+def _game_samples(feature_names: list[str], n: int, rng: np.random.Generator) -> np.ndarray:
+    """Feature rows for random in-game states, as the NFL loader produces them."""
+    X = build_feature_matrix(
+        {
+            "quarter": rng.integers(1, 5, n).astype(np.float64),
+            "clock_seconds_remaining": rng.integers(0, 901, n).astype(np.float64),
+            "home": rng.integers(0, 50, n).astype(np.float64),
+            "away": rng.integers(0, 50, n).astype(np.float64),
+        },
+        dtype=np.float64,
+    )
+    return X[:, [FEATURE_NAMES.index(name) for name in feature_names]]
+
+
+def _uniform_samples(axes: list[np.ndarray], n: int, rng: np.random.Generator) -> np.ndarray:
+    """Uniform draws over the grid; discrete axes (<= 3 points) draw their values."""
+    return np.column_stack([
+        rng.choice(axis, n) if len(axis) <= 3 else rng.uniform(axis[0], axis[-1], n)
+        for axis in axes
+    ])
+
+
+def validate_lookup_tables(
+    bundle: dict[str, Any],
+    compiled: dict[str, Any],
+    samples: int = 100_000,
+    seed: int = 0,
+) -> dict[str, Any]:
+    """Compare compiled tables with the real models on random inputs.
+
+    Returns max/mean absolute error per model for in-game feature rows and for
+    uniform draws over the whole grid.
+    """
+    rng = np.random.default_rng(seed)
+    feature_names = compiled["feature_names"]
+    sample_sets = {
+        "game_states": _game_samples(feature_names, samples, rng),
+        "uniform": _uniform_samples(compiled["threat_model"].axes, samples, rng),
+    }
+    report: dict[str, Any] = {"samples": samples}
+    for set_name, X in sample_sets.items():
+        errors: dict[str, float] = {}
+        for key in _MODEL_KEYS:
+            error = np.abs(
+                compiled[key].predict(X).astype(np.float64)
+                - np.asarray(bundle[key].predict(X), dtype=np.float64)
+            )
+            name = key.removesuffix("_model")
+            errors[f"{name}_max_abs_error"] = float(error.max())
+            errors[f"{name}_mean_abs_error"] = float(error.mean())
+        report[set_name] = errors
+    return report
+
+
+def save_lookup_tables(
+    compiled: dict[str, Any], path: Path, source_sha256: str | None, report: dict[str, Any]
+) -> None:
+    meta = {
+        "format_version": LOOKUP_FORMAT_VERSION,
+        "feature_names": compiled["feature_names"],
+        "stadium_capacity": compiled["stadium_capacity"],
+        "source_sha256": source_sha256,
+        "validation": report,
+    }
+    arrays = {f"axis_{i}": axis for i, axis in enumerate(compiled["threat_model"].axes)}
+    arrays.update({key: compiled[key].values for key in _MODEL_KEYS})
+    tmp = path.with_name(f".{path.name}.tmp")
+    with open(tmp, "wb") as f:
+        np.savez(f, meta=np.array(json.dumps(meta)), **arrays)
+    tmp.replace(path)
+
+
+def load_lookup_tables(path: Path) -> tuple[dict[str, Any], dict[str, Any]] | None:
+    """Return ``(compiled_bundle, metadata)``, or ``None`` for a missing/outdated file."""
+    if not path.exists():
+        return None
+    with np.load(path) as data:
+        meta = json.loads(str(data["meta"]))
+        if meta.get("format_version") != LOOKUP_FORMAT_VERSION:
+            return None
+        axes = [data[f"axis_{i}"] for i in range(len(meta["feature_names"]))]
+        compiled: dict[str, Any] = {
+            "feature_names": meta["feature_names"],
+            "stadium_capacity": meta["stadium_capacity"],
+        }
+        for key in _MODEL_KEYS:
+            compiled[key] = LookupTable(axes, data[key])
+    return compiled, meta
+
+
+if __name__ == "__main__":
+    from app.ml.predictor import load_model_bundle, lookup_table_path, resolve_model_path
+
+    model_path = resolve_model_path()
+    if model_path is None:
+        raise SystemExit("No trained model found; run `python -m app.ml.train` first.")
+    bundle = load_model_bundle(model_path)
+    print(f"Compiling lookup tables for {model_path} …")
+    compiled = compile_lookup_tables(bundle)
+    report = validate_lookup_tables(bundle, compiled)
+    out_path = lookup_table_path()
+    save_lookup_tables(compiled, out_path, model_checksum(model_path), report)
+    print(f"  Saved {out_path}")
+    print(json.dumps(report, indent=2))
@@ -0,0 +1,104 @@
+"""Native XGBoost artifact for the egress model bundle.
+
+``train.py`` writes each booster in XGBoost's UBJSON format next to a small
+``manifest.json``::
+
+    egress_model/
+        manifest.json        # feature names, capacity, per-file sha256
+        threat_model.ubj
+        crowd_model.ubj
+
+Loading it skips joblib and unpickling the scikit-learn wrappers entirely;
+XGBoost reads each booster file straight from its path.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import shutil
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+NATIVE_FORMAT_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+_MODEL_KEYS = ("threat_model", "crowd_model")
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class BoosterModel:
+    """``predict(X)`` over a raw booster, matching ``XGBRegressor.predict``."""
+
+    def __init__(self, booster: Any) -> None:
+        self.booster = booster
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        return self.booster.inplace_predict(np.asarray(X))
+
+
+def write_native_bundle(
+    bundle: dict[str, Any], out_dir: Path, extra: dict[str, Any] | None = None
+) -> Path:
+    """Write the bundle's boosters and manifest to *out_dir*; return the manifest path.
+
+    *extra* is merged into the manifest (e.g. registry version metadata).
+    """
+    import xgboost
+
+    staging = out_dir.with_name(f".{out_dir.name}.tmp")
+    if staging.exists():
+        shutil.rmtree(staging)
+    staging.mkdir(parents=True)
+
+    models: dict[str, dict[str, str]] = {}
+    for key in _MODEL_KEYS:
+        filename = f"{key}.ubj"
+        bundle[key].get_booster().save_model(str(staging / filename))
+        models[key] = {"file": filename, "sha256": _sha256(staging / filename)}
+
+    manifest = {
+        "format_version": NATIVE_FORMAT_VERSION,
+        "xgboost_version": xgboost.__version__,
+        "feature_names": list(bundle["feature_names"]),
+        "stadium_capacity": bundle["stadium_capacity"],
+        "models": models,
+        **(extra or {}),
+    }
+    (staging / MANIFEST_NAME).write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+
+    if out_dir.exists():
+        shutil.rmtree(out_dir)
+    staging.rename(out_dir)
+    return out_dir / MANIFEST_NAME
+
+
+def load_native_bundle(manifest_path: Path) -> dict[str, Any]:
+    """Load a bundle written by :func:`write_native_bundle`, verifying checksums."""
+    import xgboost
+
+    manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+    if manifest.get("format_version") != NATIVE_FORMAT_VERSION:
+        raise ValueError(f"Unsupported model artifact format in {manifest_path}")
+
+    bundle: dict[str, Any] = {
+        "feature_names": manifest["feature_names"],
+        "stadium_capacity": manifest["stadium_capacity"],
+    }
+    for key in _MODEL_KEYS:
+        entry = manifest["models"][key]
+        path = manifest_path.parent / entry["file"]
+        if _sha256(path) != entry["sha256"]:
+            raise ValueError(f"Checksum mismatch for {path}")
+        booster = xgboost.Booster()
+        booster.load_model(str(path))
+        bundle[key] = BoosterModel(booster)
+    return bundle
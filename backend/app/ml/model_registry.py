@@ -0,0 +1,117 @@
+"""Versioned registry of egress model bundles.
+
+Each trained bundle is published as a native artifact (see model_artifact.py)
+under its own version directory, and a one-line ``ACTIVE`` file names the
+version the API should serve::
+
+    <EGRESS_MODEL_REGISTRY>/
+        ACTIVE
+        20261017T101500Z/manifest.json threat_model.ubj crowd_model.ubj
+        ...
+
+``ACTIVE`` is replaced atomically, and every API worker polls it, so switching
+versions from the CLI or the admin endpoint swaps all workers without a restart.
+
+Usage:
+    cd backend && ../venv/bin/python3 -m app.ml.model_registry list
+    cd backend && ../venv/bin/python3 -m app.ml.model_registry activate <version>
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+from app.ml.model_artifact import MANIFEST_NAME, write_native_bundle
+
+MODEL_REGISTRY_DIR = Path(
+    os.getenv("EGRESS_MODEL_REGISTRY", "").strip()
+    or Path(__file__).resolve().parents[2] / "data" / "model_registry"
+)
+_ACTIVE_FILE = "ACTIVE"
+_VERSION_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]*$")
+
+
+def _version_dir(version: str, registry_dir: Path) -> Path:
+    if not _VERSION_RE.match(version):
+        raise ValueError(f"Invalid model version: {version!r}")
+    return registry_dir / version
+
+
+def version_manifest_path(version: str, registry_dir: Path = MODEL_REGISTRY_DIR) -> Path:
+    """Manifest of a published *version*; raises ``KeyError`` if it does not exist."""
+    path = _version_dir(version, registry_dir) / MANIFEST_NAME
+    if not path.exists():
+        raise KeyError(version)
+    return path
+
+
+def publish_model(
+    bundle: dict[str, Any],
+    registry_dir: Path = MODEL_REGISTRY_DIR,
+    version: str | None = None,
+) -> str:
+    """Write *bundle* as a new registry version and return its name (not activated)."""
+    created_at = datetime.now(timezone.utc)
+    version = version or created_at.strftime("%Y%m%dT%H%M%SZ")
+    out_dir = _version_dir(version, registry_dir)
+    if out_dir.exists():
+        raise ValueError(f"Model version already exists: {version}")
+    write_native_bundle(
+        bundle, out_dir, extra={"version": version, "created_at": created_at.isoformat()}
+    )
+    return version
+
+
+def list_model_versions(registry_dir: Path = MODEL_REGISTRY_DIR) -> list[dict[str, Any]]:
+    """Published versions, oldest first, with their manifest metadata."""
+    if not registry_dir.exists():
+        return []
+    versions: list[dict[str, Any]] = []
+    for manifest_path in sorted(registry_dir.glob(f"*/{MANIFEST_NAME}")):
+        manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+        versions.append({
+            "version": manifest_path.parent.name,
+            "created_at": manifest.get("created_at"),
+            "xgboost_version": manifest.get("xgboost_version"),
+            "feature_names": manifest.get("feature_names"),
+            "checksums": {key: entry["sha256"] for key, entry in manifest["models"].items()},
+        })
+    return versions
+
+
+def active_version(registry_dir: Path = MODEL_REGISTRY_DIR) -> str | None:
+    """Version named by the ``ACTIVE`` file, if any."""
+    try:
+        version = (registry_dir / _ACTIVE_FILE).read_text(encoding="utf-8").strip()
+    except FileNotFoundError:
+        return None
+    return version or None
+
+
+def set_active_version(version: str, registry_dir: Path = MODEL_REGISTRY_DIR) -> None:
+    """Point ``ACTIVE`` at *version* with an atomic rename."""
+    version_manifest_path(version, registry_dir)
+    tmp = registry_dir / f".{_ACTIVE_FILE}.tmp"
+    tmp.write_text(f"{version}\n", encoding="utf-8")
+    tmp.replace(registry_dir / _ACTIVE_FILE)
+
+
+if __name__ == "__main__":
+    import sys
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "list"
+    if command == "activate" and len(sys.argv) == 3:
+        set_active_version(sys.argv[2])
+        print(f"Active model version: {sys.argv[2]}")
+    elif command == "list":
+        current = active_version()
+        for entry in list_model_versions():
+            marker = "*" if entry["version"] == current else " "
+            print(f"{marker} {entry['version']}  created {entry['created_at']}")
+    else:
+        raise SystemExit("usage: python -m app.ml.model_registry [list | activate <version>]")
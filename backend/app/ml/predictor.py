@@ -3,28 +3,76 @@
 Loads the trained model bundle from egress_model.joblib (produced by train.py).
 If the file is missing or corrupt, falls back to the original heuristic so the
 rest of the pipeline never breaks.
+
+With ``EGRESS_PREDICTOR_MODE=lut`` the bundle is served from compiled lookup
+tables (see lookup_table.py) instead, which needs neither joblib nor xgboost
+once the tables have been compiled.
+
+When the model registry (model_registry.py) has an active version, that version
+is served instead of the search paths below. Activating another version loads
+and warms it while the current bundle keeps serving, then swaps the reference;
+a version can also be loaded as a shadow that is scored alongside the serving
+model so the divergence can be checked before promoting it.
 """
 
 from __future__ import annotations
 
+import asyncio
 import logging
 import os
+import time
+from collections import OrderedDict
 from pathlib import Path
 from typing import Any
 
 import numpy as np
-
-from app.ml.features import make_feature_vector
+import pandas as pd
+
+from app.ml.features import (
+    FEATURE_NAMES,
+    build_feature_matrix,
+    game_state_columns,
+    make_feature_vector,
+)
+from app.ml.lookup_table import (
+    compile_lookup_tables,
+    load_lookup_tables,
+    model_checksum,
+    save_lookup_tables,
+    validate_lookup_tables,
+)
+from app.ml.model_artifact import MANIFEST_NAME, load_native_bundle
+from app.ml.model_registry import active_version, version_manifest_path
 
 log = logging.getLogger(__name__)
 
 _PROJECT_ROOT = Path(__file__).resolve().parents[3]
 _DEFAULT_MODEL_PATH = Path(__file__).resolve().parent / "egress_model.joblib"
+_DEFAULT_LUT_PATH = Path(__file__).resolve().parent / "egress_model.lut.npz"
 _BUNDLE: dict[str, Any] | None = None
 _LOADED = False
+_ACTIVE_VERSION: str | None = None
+_SHADOW: tuple[str, dict[str, Any]] | None = None
+_SHADOW_STATS: dict[str, float] = {}
 
 STADIUM_CAPACITY = 68_000
 
+# "model" serves the trained bundle; "lut" serves compiled lookup tables.
+PREDICTOR_MODE = os.getenv("EGRESS_PREDICTOR_MODE", "").strip().lower() or "model"
+
+# Forward-filled game states repeat for long stretches, so predictions are
+# memoised on the feature vector rounded to this many decimals.
+PREDICTION_CACHE_SIZE = 4096
+_CACHE_DECIMALS = 6
+_PREDICTION_CACHE: OrderedDict[tuple[float, ...], tuple[float, int]] = OrderedDict()
+_CACHE_STATS = {"hits": 0, "misses": 0}
+# Part of every cache key, so a prediction computed by a model that has since
+# been swapped out is never served.
+_MODEL_GENERATION = 0
+
+# Seconds between checks of the registry's ACTIVE file; 0 disables the watcher.
+MODEL_WATCH_SECONDS = float(os.getenv("EGRESS_MODEL_WATCH_SECONDS", "").strip() or 5)
+
 
 def _candidate_model_paths() -> list[Path]:
     """Return candidate locations for the trained model artifact."""
@@ -32,15 +80,19 @@ def _candidate_model_paths() -> list[Path]:
 
     env_path = os.getenv("EGRESS_MODEL_PATH", "").strip()
     if env_path:
-        candidates.append(Path(env_path))
-
-    candidates.extend([
-        _DEFAULT_MODEL_PATH,
-        _PROJECT_ROOT / "exports" / "egress_model.joblib",
-        _PROJECT_ROOT / "mainData" / "egress_model.joblib",
-        Path("/mainData/egress_model.joblib"),
-        Path("/mainData/models/egress_model.joblib"),
-    ])
+        path = Path(env_path)
+        candidates.append(path / MANIFEST_NAME if path.is_dir() else path)
+
+    # The native booster artifact is preferred over the joblib bundle beside it.
+    for directory in (
+        _DEFAULT_MODEL_PATH.parent,
+        _PROJECT_ROOT / "exports",
+        _PROJECT_ROOT / "mainData",
+        Path("/mainData"),
+        Path("/mainData/models"),
+    ):
+        candidates.append(directory / "egress_model" / MANIFEST_NAME)
+        candidates.append(directory / "egress_model.joblib")
 
     # Preserve order while removing duplicates.
     deduped: list[Path] = []
@@ -67,14 +119,72 @@ def resolve_model_path() -> Path | None:
     return None
 
 
-def _ensure_model() -> dict[str, Any] | None:
-    """Lazy-load the model bundle once."""
-    global _BUNDLE, _LOADED
-    if _LOADED:
-        return _BUNDLE
+def load_model_bundle(model_path: Path) -> dict[str, Any]:
+    """Load a native booster artifact (``manifest.json``) or a joblib bundle."""
+    if model_path.name == MANIFEST_NAME:
+        return load_native_bundle(model_path)
+    import joblib
+
+    return joblib.load(model_path)
+
+
+def lookup_table_path(source_sha256: str | None = None) -> Path:
+    """Where compiled lookup tables are read from and written to.
+
+    Without a checksum this is the deployed tables file written by
+    ``python -m app.ml.lookup_table``; with one it is the file the predictor
+    compiles for that model, so every registry version keeps its own tables.
+    """
+    env_path = os.getenv("EGRESS_LUT_PATH", "").strip()
+    path = Path(env_path) if env_path else _DEFAULT_LUT_PATH
+    if source_sha256 is None:
+        return path
+    return path.with_name(f"{path.stem}.{source_sha256}{path.suffix}")
+
+
+def _load_lookup_bundle(model_path: Path | None) -> dict[str, Any] | None:
+    """Load compiled tables, compiling them from the model if missing or stale."""
+    if model_path is None:
+        lut_path = lookup_table_path()
+        loaded = load_lookup_tables(lut_path)
+        if loaded is not None:
+            log.info("Loaded compiled lookup tables from %s", lut_path)
+            return loaded[0]
+        log.warning(
+            "No trained model or lookup tables found (looked for %s). Using heuristic fallback.",
+            lut_path,
+        )
+        return None
+
+    checksum = model_checksum(model_path)
+    lut_path = lookup_table_path(checksum)
+    for candidate in (lut_path, lookup_table_path()):
+        loaded = load_lookup_tables(candidate)
+        if loaded is not None and loaded[1]["source_sha256"] == checksum:
+            log.info("Loaded compiled lookup tables from %s", candidate)
+            return loaded[0]
+
+    try:
+        bundle = load_model_bundle(model_path)
+        compiled = compile_lookup_tables(bundle)
+        report = validate_lookup_tables(bundle, compiled)
+    except Exception:
+        log.exception("Failed to compile lookup tables from %s. Using heuristic fallback.", model_path)
+        return None
+    log.info("Compiled lookup tables from %s; validation: %s", model_path, report)
+
+    try:
+        save_lookup_tables(compiled, lut_path, checksum, report)
+    except OSError:
+        log.warning("Could not write lookup tables to %s; keeping them in memory only.", lut_path)
+    return compiled
+
+
+def _load_serving_bundle(model_path: Path | None) -> dict[str, Any] | None:
+    """Load *model_path* the way PREDICTOR_MODE serves it; ``None`` means heuristic."""
+    if PREDICTOR_MODE == "lut":
+        return _load_lookup_bundle(model_path)
 
-    _LOADED = True
-    model_path = resolve_model_path()
     if model_path is None:
         searched = ", ".join(str(p) for p in _candidate_model_paths())
         log.warning(
@@ -83,45 +193,362 @@ def _ensure_model() -> dict[str, Any] | None:
         )
         return None
 
-    try:
-        import joblib
+    started = time.perf_counter()
+    bundle = load_model_bundle(model_path)
+    log.info(
+        "Loaded XGBoost model from %s in %.0f ms",
+        model_path,
+        (time.perf_counter() - started) * 1000,
+    )
+    return bundle
+
 
-        _BUNDLE = joblib.load(model_path)
-        log.info("Loaded XGBoost model from %s", model_path)
+def _set_bundle(bundle: dict[str, Any] | None, version: str | None) -> None:
+    global _BUNDLE, _LOADED, _ACTIVE_VERSION, _MODEL_GENERATION
+    _BUNDLE = bundle
+    _ACTIVE_VERSION = version
+    _LOADED = True
+    _MODEL_GENERATION += 1
+    clear_prediction_cache()
+
+
+def _ensure_model() -> dict[str, Any] | None:
+    """Lazy-load the model bundle once."""
+    if _LOADED:
+        return _BUNDLE
+
+    version = active_version()
+    if version is not None:
+        try:
+            _set_bundle(_load_serving_bundle(version_manifest_path(version)), version)
+            return _BUNDLE
+        except Exception:
+            log.exception("Failed to load registry model version %s; using search paths.", version)
+
+    model_path = resolve_model_path()
+    try:
+        bundle = _load_serving_bundle(model_path)
     except Exception:
         log.exception("Failed to load model from %s. Using heuristic fallback.", model_path)
-        _BUNDLE = None
-
+        bundle = None
+    _set_bundle(bundle, None)
     return _BUNDLE
 
 
-def _heuristic_predict(features: dict[str, float]) -> tuple[float, int]:
-    """Original rule-based fallback."""
-    score_diff = abs(features["score_diff"])
-    minutes_remaining = features["minutes_remaining"]
-    threat = min(1.0, (score_diff / 28.0) + (1.0 - min(1.0, minutes_remaining / 60.0)))
-    crowd = int(threat * STADIUM_CAPACITY)
-    return round(threat, 3), crowd
+def warm_up_predictor() -> None:
+    """Load the model and run one prediction so no request pays for either.
+
+    Called from the FastAPI lifespan; logs the serving backend and load time.
+    """
+    started = time.perf_counter()
+    bundle = _ensure_model()
+    _predict_matrix(build_feature_matrix(game_state_columns([None]), dtype=np.float64))
+    if bundle is None:
+        backend = "heuristic fallback"
+    elif PREDICTOR_MODE == "lut":
+        backend = "compiled lookup tables"
+    else:
+        backend = "XGBoost model"
+    if _ACTIVE_VERSION is not None:
+        backend += f", version {_ACTIVE_VERSION}"
+    log.info(
+        "Egress predictor ready (%s) in %.0f ms", backend, (time.perf_counter() - started) * 1000
+    )
+
+
+# ---------------------------------------------------------------------------
+# Model registry: hot swap and shadow scoring
+# ---------------------------------------------------------------------------
+
+def _load_version(version: str) -> dict[str, Any]:
+    """Load and warm a registry version without touching the serving bundle.
+
+    Raises ``KeyError`` for an unknown version and ``ValueError`` if it cannot
+    be loaded (bad checksum, unreadable artifact, failed warm-up prediction).
+    """
+    manifest_path = version_manifest_path(version)
+    try:
+        bundle = _load_serving_bundle(manifest_path)
+        if bundle is None:
+            raise ValueError("no model could be loaded")
+        _score_matrix(bundle, build_feature_matrix(game_state_columns([None]), dtype=np.float64))
+    except Exception as exc:
+        raise ValueError(f"Model version {version} failed to load: {exc}") from exc
+    return bundle
+
+
+def activate_model_version(version: str) -> None:
+    """Serve *version* from now on.
+
+    The current bundle keeps serving while the new one loads and warms up; the
+    swap itself is a single reference assignment, so in-flight predictions
+    finish on whichever bundle they started with.
+    """
+    global _SHADOW
+    started = time.perf_counter()
+    bundle = _load_version(version)
+    previous = _ACTIVE_VERSION
+    _set_bundle(bundle, version)
+    if _SHADOW is not None and _SHADOW[0] == version:
+        _SHADOW = None
+    log.info(
+        "Swapped egress model %s -> %s in %.0f ms",
+        previous or "default",
+        version,
+        (time.perf_counter() - started) * 1000,
+    )
+
+
+def set_shadow_model_version(version: str | None) -> None:
+    """Score *version* alongside the serving model (``None`` stops shadowing).
+
+    Only rows that miss the prediction cache reach the models, so only those
+    are shadow-scored.
+    """
+    global _SHADOW
+    if version is None:
+        _SHADOW = None
+        log.info("Shadow egress model disabled")
+        return
+    bundle = _load_version(version)
+    _SHADOW_STATS.clear()
+    _SHADOW = (version, bundle)
+    log.info("Shadow scoring egress model version %s", version)
+
+
+def _record_shadow_divergence(
+    threat: np.ndarray, crowd: np.ndarray, shadow_threat: np.ndarray, shadow_crowd: np.ndarray
+) -> None:
+    threat_diff = np.abs(shadow_threat - threat)
+    crowd_diff = np.abs(shadow_crowd - crowd)
+    rows = _SHADOW_STATS.get("rows", 0) + len(threat)
+    _SHADOW_STATS.update(
+        rows=rows,
+        threat_max_abs_diff=max(_SHADOW_STATS.get("threat_max_abs_diff", 0.0), float(threat_diff.max())),
+        threat_sum_abs_diff=_SHADOW_STATS.get("threat_sum_abs_diff", 0.0) + float(threat_diff.sum()),
+        crowd_max_abs_diff=max(_SHADOW_STATS.get("crowd_max_abs_diff", 0), int(crowd_diff.max())),
+        crowd_sum_abs_diff=_SHADOW_STATS.get("crowd_sum_abs_diff", 0) + int(crowd_diff.sum()),
+    )
+    # Per-call detail only; the running aggregate is served by GET /api/admin/model.
+    log.debug(
+        "Shadow model divergence over %d rows: threat max %.3f mean %.4f, crowd max %d mean %.1f",
+        len(threat),
+        float(threat_diff.max()),
+        float(threat_diff.mean()),
+        int(crowd_diff.max()),
+        float(crowd_diff.mean()),
+    )
+
+
+def model_status() -> dict[str, Any]:
+    """Serving/shadow versions, shadow divergence so far and cache counters."""
+    shadow: dict[str, Any] | None = None
+    if _SHADOW is not None:
+        rows = _SHADOW_STATS.get("rows", 0)
+        shadow = {
+            "version": _SHADOW[0],
+            "rows": rows,
+            "threat_max_abs_diff": _SHADOW_STATS.get("threat_max_abs_diff", 0.0),
+            "threat_mean_abs_diff": _SHADOW_STATS.get("threat_sum_abs_diff", 0.0) / rows if rows else 0.0,
+            "crowd_max_abs_diff": _SHADOW_STATS.get("crowd_max_abs_diff", 0),
+            "crowd_mean_abs_diff": _SHADOW_STATS.get("crowd_sum_abs_diff", 0) / rows if rows else 0.0,
+        }
+    return {
+        "mode": PREDICTOR_MODE,
+        "loaded": _LOADED,
+        "backend": "heuristic" if _LOADED and _BUNDLE is None else PREDICTOR_MODE,
+        "active_version": _ACTIVE_VERSION,
+        "shadow": shadow,
+        "cache": prediction_cache_info(),
+    }
+
+
+async def watch_model_registry(interval: float = MODEL_WATCH_SECONDS) -> None:
+    """Swap models whenever the registry's ACTIVE file names a new version.
+
+    Runs for the lifetime of the app. Loading happens in a worker thread, so
+    requests keep being served by the current model meanwhile.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        version = active_version()
+        if version is None or version == _ACTIVE_VERSION:
+            continue
+        try:
+            await asyncio.to_thread(activate_model_version, version)
+        except (KeyError, ValueError):
+            log.exception("Not swapping to model version %s; keeping %s", version, _ACTIVE_VERSION)
+            # Do not retry a broken version every interval.
+            await _wait_for_active_change(version, interval)
+
+
+async def _wait_for_active_change(version: str, interval: float) -> None:
+    while active_version() == version:
+        await asyncio.sleep(interval)
+
+
+# ---------------------------------------------------------------------------
+# Prediction cache
+# ---------------------------------------------------------------------------
+
+def _cache_key(values: list[float]) -> tuple[float, ...]:
+    return (_MODEL_GENERATION, *(round(v, _CACHE_DECIMALS) for v in values))
+
+
+def _cache_put(key: tuple[float, ...], result: tuple[float, int]) -> None:
+    _PREDICTION_CACHE[key] = result
+    _PREDICTION_CACHE.move_to_end(key)
+    while len(_PREDICTION_CACHE) > PREDICTION_CACHE_SIZE:
+        _PREDICTION_CACHE.popitem(last=False)
+
+
+def prediction_cache_info() -> dict[str, int]:
+    """Hit/miss counters and occupancy of the prediction cache."""
+    return {
+        **_CACHE_STATS,
+        "size": len(_PREDICTION_CACHE),
+        "maxsize": PREDICTION_CACHE_SIZE,
+    }
 
 
+def clear_prediction_cache() -> None:
+    """Drop cached predictions and reset the counters (e.g. after a model change)."""
+    _PREDICTION_CACHE.clear()
+    _CACHE_STATS["hits"] = 0
+    _CACHE_STATS["misses"] = 0
+
+
+# ---------------------------------------------------------------------------
+# Prediction
+# ---------------------------------------------------------------------------
+
 def predict_egress_threat(game_state: dict | None) -> tuple[float, int]:
     """Return (threat_score, estimated_crowd) for a given game state.
 
     Uses trained XGBoost models when available; heuristic otherwise.
+    Repeated feature vectors are served from the prediction cache.
     """
+    # Load first: the first load bumps the model generation that keys the cache.
+    _ensure_model()
     features = make_feature_vector(game_state)
-    bundle = _ensure_model()
+    key = _cache_key([features[f] for f in FEATURE_NAMES])
+    cached = _PREDICTION_CACHE.get(key)
+    if cached is not None:
+        _PREDICTION_CACHE.move_to_end(key)
+        _CACHE_STATS["hits"] += 1
+        return cached
+    _CACHE_STATS["misses"] += 1
+
+    result = _predict_features(features)
+    _cache_put(key, result)
+    return result
+
+
+def _predict_features(features: dict[str, float]) -> tuple[float, int]:
+    threat, crowd = _predict_matrix(np.array([[features[f] for f in FEATURE_NAMES]]))
+    return float(threat[0]), int(crowd[0])
+
+
+def _heuristic_predict_batch(X: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Original rule-based fallback over a FEATURE_NAMES matrix."""
+    score_diff = np.abs(X[:, FEATURE_NAMES.index("score_diff")])
+    minutes_remaining = X[:, FEATURE_NAMES.index("minutes_remaining")]
+    threat = np.minimum(1.0, (score_diff / 28.0) + (1.0 - np.minimum(1.0, minutes_remaining / 60.0)))
+    crowd = np.trunc(threat * STADIUM_CAPACITY).astype(np.int64)
+    return _round3(threat), crowd
+
+
+def _round3(values: np.ndarray) -> np.ndarray:
+    # Python's round() keeps batch scores identical to the per-minute path.
+    return np.array([round(v, 3) for v in values.tolist()], dtype=np.float64)
 
+
+def _score_matrix(bundle: dict[str, Any] | None, X: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
     if bundle is None:
-        return _heuristic_predict(features)
+        return _heuristic_predict_batch(X)
+
+    columns = [FEATURE_NAMES.index(f) for f in bundle["feature_names"]]
+    X = X[:, columns]
+
+    threat = np.clip(_round3(bundle["threat_model"].predict(X).astype(np.float64)), 0.0, 1.0)
+
+    crowd = np.trunc(bundle["crowd_model"].predict(X)).astype(np.int64)
+    crowd = np.clip(crowd, 0, bundle.get("stadium_capacity", STADIUM_CAPACITY))
+
+    return threat, crowd
+
 
-    feature_names: list[str] = bundle["feature_names"]
-    X = np.array([[features[f] for f in feature_names]])
+def _predict_matrix(X: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    threat, crowd = _score_matrix(_ensure_model(), X)
 
-    threat_score = float(bundle["threat_model"].predict(X)[0])
-    threat_score = max(0.0, min(1.0, round(threat_score, 3)))
+    shadow = _SHADOW
+    if shadow is not None:
+        try:
+            shadow_threat, shadow_crowd = _score_matrix(shadow[1], X)
+            _record_shadow_divergence(threat, crowd, shadow_threat, shadow_crowd)
+        except Exception:
+            log.exception("Shadow model %s failed; serving results are unaffected.", shadow[0])
 
-    crowd = int(bundle["crowd_model"].predict(X)[0])
-    crowd = max(0, min(bundle.get("stadium_capacity", STADIUM_CAPACITY), crowd))
+    return threat, crowd
 
-    return threat_score, crowd
+
+def predict_egress_threat_batch(
+    features: np.ndarray | pd.DataFrame,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Vectorised :func:`predict_egress_threat` for many minutes at once.
+
+    *features* is either a game-state table from
+    ``nfl_data.build_game_state_table`` or a matrix from
+    ``features.build_feature_matrix`` (columns in ``FEATURE_NAMES`` order). Pass
+    a float64 matrix for scores identical to the per-minute path.
+
+    Repeated rows are predicted once, rows already in the prediction cache are
+    not predicted at all, and each model is called once for the remainder.
+
+    Returns ``(threat_scores, crowds)`` as float64 and int64 arrays.
+    """
+    _ensure_model()
+    if isinstance(features, pd.DataFrame):
+        X = build_feature_matrix(features, dtype=np.float64)
+    else:
+        X = np.asarray(features, dtype=np.float64)
+
+    # groupby().ngroup() labels identical rows far faster than np.unique(axis=0).
+    codes = (
+        pd.DataFrame(X)
+        .groupby(list(range(X.shape[1])), sort=False, dropna=False)
+        .ngroup()
+        .to_numpy()
+    )
+    _, first, inverse, counts = np.unique(
+        codes, return_index=True, return_inverse=True, return_counts=True
+    )
+    unique = X[first]
+    threat = np.empty(len(unique), dtype=np.float64)
+    crowd = np.empty(len(unique), dtype=np.int64)
+
+    # Rows that quantise to the same key share one prediction.
+    missing: dict[tuple[float, ...], list[int]] = {}
+    for i, (row, count) in enumerate(zip(unique.tolist(), counts.tolist())):
+        key = _cache_key(row)
+        cached = _PREDICTION_CACHE.get(key)
+        if cached is not None:
+            _PREDICTION_CACHE.move_to_end(key)
+            _CACHE_STATS["hits"] += count
+            threat[i], crowd[i] = cached
+        else:
+            missing.setdefault(key, []).append(i)
+
+    if missing:
+        leaders = [group[0] for group in missing.values()]
+        new_threat, new_crowd = _predict_matrix(unique[leaders])
+        for (key, group), key_threat, key_crowd in zip(
+            missing.items(), new_threat.tolist(), new_crowd.tolist()
+        ):
+            threat[group] = key_threat
+            crowd[group] = key_crowd
+            _CACHE_STATS["misses"] += 1
+            _CACHE_STATS["hits"] += int(counts[group].sum()) - 1
+            _cache_put(key, (key_threat, key_crowd))
+
+    return threat[inverse], crowd[inverse]
@@ -5,23 +5,43 @@ using domain heuristics, then trains two XGBoost regressors:
   1. egress_threat_score  (0.0 – 1.0)
   2. estimated_crowd_volume (0 – stadium capacity)
 
-The trained model is saved as a joblib file that predictor.py loads at runtime.
+The trained model is saved as a joblib file and as native XGBoost boosters
+(egress_model/, preferred by predictor.py at runtime), and is published as a
+new, inactive version in the model registry (see model_registry.py).
 
 Usage:
     cd backend && ../venv/bin/python3 -m app.ml.train
+    cd backend && ../venv/bin/python3 -m app.ml.train --search parallel --workers 8
+
+``--search parallel`` replaces the two sequential RandomizedSearchCV runs with
+hyperparam_search.parallel_search: both targets at once in a process pool,
+early-stopped ``hist`` trees, and a checkpoint that lets a rerun resume.
+
+Most plays repeat an earlier feature row exactly, so training rows are
+collapsed into unique rows with sample weights before fitting;
+``--dedup-report`` fits one model both ways to show the quality is unchanged.
 """
 
 from __future__ import annotations
 
-
+import argparse
+import json
+import time
 from pathlib import Path
 
 import joblib
+import numpy as np
 import pandas as pd
+import sklearn
+from sklearn.metrics import make_scorer, r2_score
 from sklearn.model_selection import RandomizedSearchCV, train_test_split
 from xgboost import XGBRegressor
 
-from app.ml.features import GAME_FEATURES
+from app.etl.nfl_store import ensure_nfl_store, load_games
+from app.ml.features import GAME_FEATURES, build_feature_matrix
+from app.ml.hyperparam_search import parallel_search
+from app.ml.model_artifact import write_native_bundle
+from app.ml.model_registry import publish_model
 
 PROJECT_ROOT = Path(__file__).resolve().parents[3]
 
@@ -40,6 +60,11 @@ def _resolve_data_file(filename: str) -> Path:
 NFL_CSV = _resolve_data_file("NFL Play by Play 2009-2018 (v5).csv")
 MODEL_DIR = Path(__file__).resolve().parent
 MODEL_PATH = MODEL_DIR / "egress_model.joblib"
+NATIVE_MODEL_DIR = MODEL_DIR / "egress_model"
+# Columnar cache of the built training frame, reused while the CSV checksum and
+# TRAINING_DATA_VERSION match. Bump the version when labels or features change.
+TRAINING_CACHE_PATH = PROJECT_ROOT / "backend" / "data" / "training_data.npz"
+TRAINING_DATA_VERSION = 1
 
 STADIUM_CAPACITY = 68_000
 
@@ -96,81 +121,206 @@ def _heuristic_threat(score_diff: float, minutes_remaining: float,
     return max(0.0, min(1.0, raw))
 
 
-def _format_clock_seconds(time_str) -> float:
-    """Convert 'MM:SS' or 'M:SS' to seconds. Returns 900 on failure."""
-    if pd.isna(time_str):
-        return 900.0
-    s = str(time_str).strip()
-    parts = s.split(":")
-    if len(parts) >= 2:
-        try:
-            return int(parts[0]) * 60 + int(parts[1])
-        except ValueError:
-            return 900.0
-    return 900.0
+def _heuristic_threat_batch(score_diff: np.ndarray, minutes_remaining: np.ndarray,
+                            quarter: np.ndarray) -> np.ndarray:
+    """Vectorised :func:`_heuristic_threat`; gives bit-identical labels."""
+    time_factor = np.maximum(0.0, 1.0 - minutes_remaining / 60.0)
+
+    diff_abs = np.abs(score_diff)
+    diff_factor = np.minimum(1.0, diff_abs / 28.0)
+
+    blowout_boost = np.where(
+        (quarter >= 3) & (score_diff <= -14), 0.3 * np.minimum(1.0, diff_abs / 35.0), 0.0
+    )
+
+    raw = 0.5 * time_factor + 0.3 * diff_factor + blowout_boost
+
+    raw = np.where(minutes_remaining > 45, raw * 0.3,
+                   np.where(minutes_remaining > 30, raw * 0.6, raw))
+
+    return np.clip(raw, 0.0, 1.0)
 
 
 # ---------------------------------------------------------------------------
 # Training data builder
 # ---------------------------------------------------------------------------
 
-def build_training_data() -> pd.DataFrame:
-    """Build feature matrix + labels from all NFL games in the CSV."""
+def _load_training_cache(csv_sha256: str) -> pd.DataFrame | None:
+    if not TRAINING_CACHE_PATH.exists():
+        return None
+    with np.load(TRAINING_CACHE_PATH) as data:
+        meta = json.loads(str(data["meta"]))
+        if meta != {"version": TRAINING_DATA_VERSION, "csv_sha256": csv_sha256}:
+            return None
+        return pd.DataFrame({column: data[column] for column in data.files if column != "meta"})
+
+
+def _save_training_cache(training_df: pd.DataFrame, csv_sha256: str) -> None:
+    meta = {"version": TRAINING_DATA_VERSION, "csv_sha256": csv_sha256}
+    TRAINING_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+    tmp = TRAINING_CACHE_PATH.with_name(f".{TRAINING_CACHE_PATH.name}.tmp")
+    with open(tmp, "wb") as f:
+        np.savez(
+            f,
+            meta=np.array(json.dumps(meta)),
+            **{column: training_df[column].to_numpy() for column in training_df.columns},
+        )
+    tmp.replace(TRAINING_CACHE_PATH)
+
+
+def build_training_data(use_cache: bool = True) -> pd.DataFrame:
+    """Build feature matrix + labels from all NFL games in the CSV.
+
+    The result is cached in TRAINING_CACHE_PATH and reused until the CSV
+    checksum changes.
+    """
+    csv_sha256 = ensure_nfl_store(NFL_CSV)["sha256"]
+    if use_cache:
+        cached = _load_training_cache(csv_sha256)
+        if cached is not None:
+            print(f"Loaded {len(cached):,} cached training samples from {TRAINING_CACHE_PATH}")
+            return cached
+
     print(f"Loading NFL play-by-play from {NFL_CSV} …")
-    df = pd.read_csv(NFL_CSV, usecols=_NFL_COLS, encoding="utf-8-sig")
+    df = load_games(NFL_CSV, columns=_NFL_COLS)
     print(f"  {len(df):,} plays across {df['game_id'].nunique():,} games")
 
     df = df.dropna(subset=["game_seconds_remaining", "qtr"])
     df = df[df["qtr"].isin([1, 2, 3, 4, 5])]
+    df = df.sort_values(
+        ["game_id", "game_seconds_remaining"], ascending=[True, False], kind="stable"
+    )
 
-    records: list[dict] = []
-
-    for _, game_df in df.groupby("game_id"):
-        game_df = game_df.sort_values("game_seconds_remaining", ascending=False)
-
-        for _, play in game_df.iterrows():
-            quarter = float(play["qtr"])
-            clock_secs = float(play.get("game_seconds_remaining", 0))
-            # game_seconds_remaining is total across all quarters
-            minutes_remaining = max(0.0, clock_secs / 60.0)
-
-            home = float(play["total_home_score"]) if not pd.isna(play["total_home_score"]) else 0.0
-            away = float(play["total_away_score"]) if not pd.isna(play["total_away_score"]) else 0.0
-            score_diff = home - away
-
-            blowout = 1.0 if (quarter >= 3 and score_diff <= -14) else 0.0
-
-            if minutes_remaining <= 0:
-                time_pressure = 0.0
-            else:
-                quarter_weight = 2.0 if quarter >= 4 else 1.0
-                time_pressure = min(1.0, (minutes_remaining / 60.0) * quarter_weight)
-
-            momentum = 0.0  # no per-play momentum in this dataset
-
-            threat = _heuristic_threat(score_diff, minutes_remaining, quarter)
-            crowd = int(threat * STADIUM_CAPACITY)
+    quarter = df["qtr"].to_numpy(dtype=np.float64)
+    game_secs = df["game_seconds_remaining"].to_numpy(dtype=np.float64)
+    # game_seconds_remaining is total across all quarters; the shared builder
+    # takes the quarter clock, so hand it the equivalent clock reading.
+    X = build_feature_matrix({
+        "quarter": quarter,
+        "clock_seconds_remaining": game_secs - (4 - quarter) * 900,
+        "home": df["total_home_score"],
+        "away": df["total_away_score"],
+    })
+
+    score_diff = (
+        df["total_home_score"].fillna(0).to_numpy(dtype=np.float64)
+        - df["total_away_score"].fillna(0).to_numpy(dtype=np.float64)
+    )
+    minutes_remaining = np.maximum(0.0, game_secs / 60.0)
+    threat = _heuristic_threat_batch(score_diff, minutes_remaining, quarter)
 
-            records.append({
-                "score_diff": score_diff,
-                "minutes_remaining": minutes_remaining,
-                "momentum": momentum,
-                "blowout_indicator": blowout,
-                "time_pressure": time_pressure,
-                "threat_label": threat,
-                "crowd_label": crowd,
-            })
+    records = {name: X[:, i] for i, name in enumerate(GAME_FEATURES)}
+    records["threat_label"] = threat
+    records["crowd_label"] = (threat * STADIUM_CAPACITY).astype(np.int64)
 
     training_df = pd.DataFrame(records)
     print(f"  Built {len(training_df):,} training samples")
+    try:
+        _save_training_cache(training_df, csv_sha256)
+    except OSError:
+        print(f"  Could not write training cache to {TRAINING_CACHE_PATH}")
     return training_df
 
 
+def deduplicate_samples(
+    X: np.ndarray, *targets: np.ndarray
+) -> tuple[np.ndarray, list[np.ndarray], np.ndarray]:
+    """Collapse identical (features, labels) rows into unique rows plus counts.
+
+    Returns ``(X_unique, targets_unique, weights)``; training on the unique
+    rows with ``sample_weight=weights`` is equivalent to training on all rows.
+    Both search modes also weight their CV scores; the folds themselves split
+    unique rows, so duplicates of one row never straddle train and validation.
+    Rows keep the order of their first occurrence.
+    """
+    frame = pd.DataFrame({f"x{i}": X[:, i] for i in range(X.shape[1])})
+    for i, y in enumerate(targets):
+        frame[f"y{i}"] = y
+    unique = frame.groupby(list(frame.columns), sort=False, dropna=False).size().reset_index()
+    X_unique = unique[frame.columns[: X.shape[1]]].to_numpy(dtype=X.dtype)
+    targets_unique = [
+        unique[f"y{i}"].to_numpy(dtype=y.dtype) for i, y in enumerate(targets)
+    ]
+    return X_unique, targets_unique, unique[0].to_numpy(dtype=np.float64)
+
+
+def _dedup_report(X_train, yt_train, yc_train, X_test, yt_test, yc_test) -> None:
+    """Fit fixed-parameter models on all rows and on weighted unique rows."""
+    X_unique, (yt_unique, yc_unique), weights = deduplicate_samples(X_train, yt_train, yc_train)
+    print(f"\nDeduplication report ({len(X_train):,} -> {len(X_unique):,} rows)")
+    for name, y_all, y_unique, y_test in (
+        ("threat", yt_train, yt_unique, yt_test),
+        ("crowd", yc_train, yc_unique, yc_test),
+    ):
+        predictions = []
+        for label, fit_args in (
+            ("all rows", (X_train, y_all, None)),
+            ("weighted", (X_unique, y_unique, weights)),
+        ):
+            model = XGBRegressor(tree_method="hist", random_state=42, verbosity=0)
+            started = time.perf_counter()
+            model.fit(fit_args[0], fit_args[1], sample_weight=fit_args[2])
+            elapsed = time.perf_counter() - started
+            predictions.append(model.predict(X_test).astype(np.float64))
+            print(f"  {name} {label:<8}  test R² {r2_score(y_test, predictions[-1]):.6f}"
+                  f"  fit {elapsed:.2f} s")
+        print(f"  {name} max |prediction difference|: "
+              f"{np.abs(predictions[0] - predictions[1]).max():.6g}")
+
+
 # ---------------------------------------------------------------------------
 # Model training
 # ---------------------------------------------------------------------------
 
-def train_model() -> None:
+def _randomized_search(X_train, y_train, random_state: int,
+                       sample_weight: np.ndarray | None = None) -> XGBRegressor:
+    # Route the weights to the CV scorer as well as to fit, so deduplicated
+    # rows are scored like parallel_search's weighted R² and both search modes
+    # rank candidates as if every original row were present.
+    with sklearn.config_context(enable_metadata_routing=True):
+        search = RandomizedSearchCV(
+            XGBRegressor(random_state=42, verbosity=0).set_fit_request(sample_weight=True),
+            param_distributions=_PARAM_GRID,
+            n_iter=_N_ITER,
+            cv=_CV,
+            scoring=make_scorer(r2_score).set_score_request(sample_weight=True),
+            random_state=random_state,
+            n_jobs=1,  # use n_jobs=-1 for parallel CV when not in sandbox
+            verbose=1,
+        )
+        search.fit(X_train, y_train, sample_weight=sample_weight)
+    print(f"  Best params: {search.best_params_}")
+    print(f"  Best CV R²:  {search.best_score_:.4f}")
+    return search.best_estimator_
+
+
+def _parallel_search(X_train, yt_train, yc_train, sample_weight: np.ndarray | None,
+                     max_workers: int | None,
+                     threads_per_worker: int | None) -> tuple[XGBRegressor, XGBRegressor]:
+    print("\nParallel early-stopping search for threat score and crowd volume models …")
+    results = parallel_search(
+        X_train,
+        {"threat": yt_train, "crowd": yc_train},
+        _PARAM_GRID,
+        n_iter=_N_ITER,
+        seeds={"threat": 42, "crowd": 43},
+        cv=_CV,
+        sample_weight=sample_weight,
+        max_workers=max_workers,
+        threads_per_worker=threads_per_worker,
+    )
+    models = []
+    for target, y_train in (("threat", yt_train), ("crowd", yc_train)):
+        result = results[target]
+        print(f"  {target}: best params {result['params']}")
+        print(f"  {target}: best CV R²  {result['score']:.4f}")
+        model = XGBRegressor(**result["params"], tree_method="hist", random_state=42, verbosity=0)
+        models.append(model.fit(X_train, y_train, sample_weight=sample_weight))
+    return models[0], models[1]
+
+
+def train_model(search: str = "random", max_workers: int | None = None,
+                threads_per_worker: int | None = None, dedup_report: bool = False) -> None:
     training_df = build_training_data()
 
     feature_cols = list(GAME_FEATURES)
@@ -182,43 +332,26 @@ def train_model() -> None:
         X, y_threat, y_crowd, test_size=0.15, random_state=42,
     )
 
-    base = XGBRegressor(random_state=42, verbosity=0)
+    if dedup_report:
+        _dedup_report(X_train, yt_train, yc_train, X_test, yt_test, yc_test)
 
-    print("\nRandomizedSearchCV for threat score model …")
-    threat_search = RandomizedSearchCV(
-        base,
-        param_distributions=_PARAM_GRID,
-        n_iter=_N_ITER,
-        cv=_CV,
-        scoring="r2",
-        random_state=42,
-        n_jobs=1,
-        verbose=1,
-    )
-    threat_search.fit(X_train, yt_train)
-    threat_model = threat_search.best_estimator_
-    threat_score = threat_model.score(X_test, yt_test)
-    print(f"  Best params: {threat_search.best_params_}")
-    print(f"  Best CV R²:  {threat_search.best_score_:.4f}")
-    print(f"  Test R²:    {threat_score:.4f}")
-
-    print("\nRandomizedSearchCV for crowd volume model …")
-    crowd_search = RandomizedSearchCV(
-        base,
-        param_distributions=_PARAM_GRID,
-        n_iter=_N_ITER,
-        cv=_CV,
-        scoring="r2",
-        random_state=43,
-        n_jobs=1,  # use n_jobs=-1 for parallel CV when not in sandbox
-        verbose=1,
-    )
-    crowd_search.fit(X_train, yc_train)
-    crowd_model = crowd_search.best_estimator_
-    crowd_score = crowd_model.score(X_test, yc_test)
-    print(f"  Best params: {crowd_search.best_params_}")
-    print(f"  Best CV R²:  {crowd_search.best_score_:.4f}")
-    print(f"  Test R²:    {crowd_score:.4f}")
+    # The test split stays row-level, so test scores are comparable across runs.
+    X_train, (yt_train, yc_train), weights = deduplicate_samples(X_train, yt_train, yc_train)
+    print(f"\nDeduplicated training rows: {int(weights.sum()):,} -> {len(X_train):,} "
+          f"({weights.sum() / len(X_train):.1f}x compression)")
+
+    if search == "parallel":
+        threat_model, crowd_model = _parallel_search(
+            X_train, yt_train, yc_train, weights, max_workers, threads_per_worker
+        )
+    else:
+        print("\nRandomizedSearchCV for threat score model …")
+        threat_model = _randomized_search(X_train, yt_train, random_state=42, sample_weight=weights)
+        print("\nRandomizedSearchCV for crowd volume model …")
+        crowd_model = _randomized_search(X_train, yc_train, random_state=43, sample_weight=weights)
+
+    print(f"\nThreat model test R²: {threat_model.score(X_test, yt_test):.4f}")
+    print(f"Crowd model test R²:  {crowd_model.score(X_test, yc_test):.4f}")
 
     bundle = {
         "threat_model": threat_model,
@@ -228,7 +361,21 @@ def train_model() -> None:
     }
     joblib.dump(bundle, MODEL_PATH)
     print(f"\nModel saved to {MODEL_PATH}")
+    manifest_path = write_native_bundle(bundle, NATIVE_MODEL_DIR)
+    print(f"Native boosters saved to {manifest_path.parent}")
+    version = publish_model(bundle)
+    print(f"Published registry version {version} "
+          f"(activate with `python -m app.ml.model_registry activate {version}`)")
 
 
 if __name__ == "__main__":
-    train_model()
+    parser = argparse.ArgumentParser(description="Train the egress threat/crowd models.")
+    parser.add_argument("--search", choices=["random", "parallel"], default="random")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Process pool size for --search parallel (default: CPU count).")
+    parser.add_argument("--threads-per-worker", type=int, default=None,
+                        help="Thread cap per worker (default: CPU count / workers).")
+    parser.add_argument("--dedup-report", action="store_true",
+                        help="Compare a model fit on all rows with one fit on weighted unique rows.")
+    args = parser.parse_args()
+    train_model(args.search, args.workers, args.threads_per_worker, args.dedup_report)
@@ -1,19 +1,30 @@
 from __future__ import annotations
 
-from contextlib import asynccontextmanager
+import asyncio
+from contextlib import asynccontextmanager, suppress
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from app.api.admin import router as admin_router
+from app.api.playback import playback_sessions
 from app.api.routes import router as api_router
 from app.config import settings
 from app.db.session import init_db
+from app.ml.predictor import MODEL_WATCH_SECONDS, warm_up_predictor, watch_model_registry
 
 
 @asynccontextmanager
 async def lifespan(_: FastAPI):
     await init_db()
+    warm_up_predictor()
+    watcher = asyncio.create_task(watch_model_registry()) if MODEL_WATCH_SECONDS > 0 else None
     yield
+    if watcher is not None:
+        watcher.cancel()
+        with suppress(asyncio.CancelledError):
+            await watcher
+    await playback_sessions.shutdown()
 
 
 app = FastAPI(title=settings.app_name, version="0.1.0", lifespan=lifespan)
@@ -27,6 +38,7 @@ app.add_middleware(
 )
 
 app.include_router(api_router, prefix="/api")
+app.include_router(admin_router, prefix="/api")
 
 
 @app.get("/healthz")
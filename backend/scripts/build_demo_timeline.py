@@ -19,7 +19,16 @@ from typing import Any
 sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
 
 from app.etl.scenarios import get_scenario  # noqa: E402
-from app.ml.simulation_engine import CRITICAL_CAPACITY_THRESHOLD, SimulationConfig, simulate_surge_velocity  # noqa: E402
+from app.ml.simulation_engine import (  # noqa: E402
+    CRITICAL_CAPACITY_THRESHOLD,
+    SIMULATION_MODES,
+    SAMPLING_METHODS,
+    SURGE_PERCENTILE,
+    SimulationConfig,
+    quantile_key,
+    simulate_surge_envelope,
+    surge_envelope_frame,
+)
 
 PROJECT_ROOT = Path(__file__).resolve().parents[2]
 BACKEND_ROOT = Path(__file__).resolve().parents[1]
@@ -173,6 +182,11 @@ def build_demo_timeline(
     scenario_id: str,
     num_simulations: int,
     random_seed: int,
+    simulation_mode: str = "sampled",
+    max_memory_mb: float = 256.0,
+    workers: int | None = None,
+    sampling: str = "random",
+    ci_tolerance: float | None = None,
 ) -> dict[str, Any]:
     scenario_meta = get_scenario(scenario_id)
     if not scenario_meta:
@@ -261,19 +275,25 @@ def build_demo_timeline(
             }
         )
 
-    surge_curve = simulate_surge_velocity(
+    envelope = simulate_surge_envelope(
         base_timeline,
         config=SimulationConfig(
             num_simulations=num_simulations,
             random_seed=random_seed,
             critical_capacity_threshold=CRITICAL_CAPACITY_THRESHOLD,
+            mode=simulation_mode,
+            max_memory_mb=max_memory_mb,
+            workers=workers,
+            sampling=sampling,
+            ci_tolerance=ci_tolerance,
         ),
     )
 
     timeline: list[dict[str, Any]] = []
     for minute, frame in enumerate(base_timeline):
         threat = float(frame["egress_threat_score"])
-        predicted_surge = int(surge_curve[minute])
+        surge_envelope = surge_envelope_frame(envelope, minute)
+        predicted_surge = surge_envelope[quantile_key(SURGE_PERCENTILE)]
         critical_threshold = CRITICAL_CAPACITY_THRESHOLD
 
         platform_utilization_pct = int(round((predicted_surge / max(critical_threshold, 1)) * 100))
@@ -368,6 +388,7 @@ def build_demo_timeline(
                 "egress_threat_score": round(threat, 3),
                 "estimated_crowd_volume": int(frame["estimated_crowd_volume"]),
                 "predicted_surge_velocity": int(predicted_surge),
+                "surge_envelope": surge_envelope,
                 "critical_capacity_threshold": critical_threshold,
                 "platform_utilization_pct": platform_utilization_pct,
                 "transit_status": transit_status,
@@ -403,12 +424,47 @@ def main() -> None:
     parser.add_argument("--scenario-id", default="scenario_c_blowout_q3")
     parser.add_argument("--num-simulations", type=int, default=10_000)
     parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--simulation-mode",
+        choices=SIMULATION_MODES,
+        default="sampled",
+        help="'analytic' computes the exact p95 surge without Monte Carlo sampling.",
+    )
+    parser.add_argument(
+        "--max-memory-mb",
+        type=float,
+        default=256.0,
+        help="Memory budget for Monte Carlo sampling buffers.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Process pool size for --simulation-mode parallel (default: all cores).",
+    )
+    parser.add_argument(
+        "--sampling",
+        choices=SAMPLING_METHODS,
+        default="random",
+        help="Variance-reduced draws for --simulation-mode sampled.",
+    )
+    parser.add_argument(
+        "--ci-tolerance",
+        type=float,
+        default=None,
+        help="Stop sampling a minute once its p95 confidence interval is this narrow (fans/minute).",
+    )
     args = parser.parse_args()
 
     payload = build_demo_timeline(
         scenario_id=args.scenario_id,
         num_simulations=args.num_simulations,
         random_seed=args.seed,
+        simulation_mode=args.simulation_mode,
+        max_memory_mb=args.max_memory_mb,
+        workers=args.workers,
+        sampling=args.sampling,
+        ci_tolerance=args.ci_tolerance,
     )
 
     EXPORT_PATH.parent.mkdir(parents=True, exist_ok=True)
@@ -13,20 +13,25 @@ from __future__ import annotations
 import asyncio
 import json
 import sys
+import uuid
 from pathlib import Path
 
 # Ensure the backend package is importable when run via ``python -m scripts.precompute``
 sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
 
+import numpy as np  # noqa: E402
 from sqlalchemy import delete, select  # noqa: E402
 
 from app.ai.orchestrator import EgressContext, build_routing_decision_async  # noqa: E402
-from app.db.models import Predictions, RoutingDecisions, TransitCache  # noqa: E402
+from app.api.scenario_pack import prune_scenario_packs, write_scenario_pack  # noqa: E402
+from app.api.timeline import TIMELINE_MINUTES, fetch_timeline_rows  # noqa: E402
+from app.db.models import PrecomputeRuns, Predictions, RoutingDecisions, TransitCache  # noqa: E402
 from app.db.session import AsyncSessionLocal, init_db  # noqa: E402
 from app.etl.nfl_data import load_nfl_game_states  # noqa: E402
 from app.etl.scenarios import SCENARIOS  # noqa: E402
 from app.etl.seattle_data import ingest_seattle_traffic_data  # noqa: E402
-from app.ml.predictor import predict_egress_threat  # noqa: E402
+from app.ml.features import build_feature_matrix, game_state_columns  # noqa: E402
+from app.ml.predictor import predict_egress_threat_batch, prediction_cache_info  # noqa: E402
 
 ROUTES_PATH = Path(__file__).resolve().parents[1] / "data" / "geojson_routes" / "routes.json"
 ROUTING_THREAT_THRESHOLD = 0.5
@@ -60,12 +65,26 @@ async def precompute_all() -> None:
     # ------------------------------------------------------------------
     _banner("STEP 3: ML Predictions + AI Routing Decisions")
 
+    # One batched model call covers every minute of every scenario.
+    minute_states = [
+        game_states[scenario_id].get(minute)
+        for scenario_id in SCENARIOS
+        for minute in range(TIMELINE_MINUTES)
+    ]
+    features = build_feature_matrix(game_state_columns(minute_states), dtype=np.float64)
+    threats, crowds = predict_egress_threat_batch(features)
+    cache = prediction_cache_info()
+    print(f"  {len(minute_states):,} predictions: {cache['misses']:,} model rows, "
+          f"{cache['hits']:,} repeats served from cache")
+    threats = threats.reshape(len(SCENARIOS), TIMELINE_MINUTES).tolist()
+    crowds = crowds.reshape(len(SCENARIOS), TIMELINE_MINUTES).tolist()
+
     async with AsyncSessionLocal() as session:
         await session.execute(delete(Predictions))
         await session.execute(delete(RoutingDecisions))
         await session.commit()
 
-        for scenario_id in SCENARIOS:
+        for scenario_index, scenario_id in enumerate(SCENARIOS):
             scenario_states = game_states[scenario_id]
             pred_rows: list[Predictions] = []
             route_rows: list[RoutingDecisions] = []
@@ -88,7 +107,8 @@ async def precompute_all() -> None:
             for minute in range(1440):
                 game_state = scenario_states.get(minute)
 
-                threat, crowd = predict_egress_threat(game_state)
+                threat = threats[scenario_index][minute]
+                crowd = crowds[scenario_index][minute]
 
                 pred_rows.append(Predictions(
                     scenario_id=scenario_id,
@@ -127,6 +147,24 @@ async def precompute_all() -> None:
             print(f"  {scenario_id}: {len(pred_rows):,} predictions, "
                   f"{len(route_rows)} routing decisions")
 
+        # Scenario packs are written before the generation stamp is committed,
+        # so the API never sees a generation whose packs are still missing.
+        generation = uuid.uuid4().hex
+        for scenario_id in SCENARIOS:
+            rows = await fetch_timeline_rows(session, scenario_id, 0, TIMELINE_MINUTES, None)
+            if rows is not None:
+                path = write_scenario_pack(scenario_id, generation, rows)
+                print(f"  Scenario pack: {path}")
+
+        # New generation stamp: invalidates the API's compiled timelines and ETags.
+        session.add(PrecomputeRuns(generation=generation))
+        await session.commit()
+        print(f"  Precompute generation: {generation}")
+
+        # Older packs go only once the new stamp is committed.
+        for scenario_id in SCENARIOS:
+            prune_scenario_packs(scenario_id, generation)
+
     _banner("PRE-COMPUTATION COMPLETE")
 
 
@@ -0,0 +1,6 @@
+"""Put ``backend/`` on ``sys.path`` so tests import ``app`` from any working directory."""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
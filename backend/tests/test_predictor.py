@@ -0,0 +1,66 @@
+"""Registry swaps in lookup-table mode keep each model's compiled tables apart."""
+
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from app.ml import predictor
+from app.ml.lookup_table import DEFAULT_GRID, load_lookup_tables, model_checksum
+
+
+class LinearModel:
+    """Stands in for a booster: any object with ``predict(X)`` compiles."""
+
+    def __init__(self, weights: np.ndarray, bias: float) -> None:
+        self.weights = weights
+        self.bias = bias
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        return (X @ self.weights + self.bias).astype(np.float32)
+
+
+def fake_bundle(scale: float) -> dict:
+    weights = np.linspace(0.001, 0.002, len(DEFAULT_GRID)) * scale
+    return {
+        "feature_names": list(DEFAULT_GRID),
+        "stadium_capacity": predictor.STADIUM_CAPACITY,
+        "threat_model": LinearModel(weights, 0.2),
+        "crowd_model": LinearModel(weights * 1_000.0, 20_000.0),
+    }
+
+
+def test_shadowing_in_lut_mode_keeps_active_tables(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    manifests = {}
+    for version, scale in (("v1", 1.0), ("v2", 3.0)):
+        manifests[version] = tmp_path / version / "manifest.json"
+        manifests[version].parent.mkdir()
+        manifests[version].write_text(f'{{"scale": {scale}}}')
+    bundles = {manifests["v1"]: fake_bundle(1.0), manifests["v2"]: fake_bundle(3.0)}
+
+    monkeypatch.setenv("EGRESS_LUT_PATH", str(tmp_path / "egress_model.lut.npz"))
+    monkeypatch.setattr(predictor, "PREDICTOR_MODE", "lut")
+    monkeypatch.setattr(predictor, "version_manifest_path", manifests.__getitem__)
+    monkeypatch.setattr(predictor, "load_model_bundle", bundles.__getitem__)
+    for name in ("_BUNDLE", "_LOADED", "_ACTIVE_VERSION", "_SHADOW", "_MODEL_GENERATION"):
+        monkeypatch.setattr(predictor, name, getattr(predictor, name))
+
+    predictor.activate_model_version("v1")
+    active_path = predictor.lookup_table_path(model_checksum(manifests["v1"]))
+    active_bytes = active_path.read_bytes()
+
+    predictor.set_shadow_model_version("v2")
+    assert active_path.read_bytes() == active_bytes
+    shadow_path = predictor.lookup_table_path(model_checksum(manifests["v2"]))
+    assert load_lookup_tables(shadow_path)[1]["source_sha256"] == model_checksum(manifests["v2"])
+    assert not predictor.lookup_table_path().exists()
+
+    # A restart serving v1 finds its tables and never loads the model itself.
+    def no_model(path: Path) -> dict:
+        raise AssertionError(f"loaded {path}")
+
+    monkeypatch.setattr(predictor, "load_model_bundle", no_model)
+    reloaded = predictor._load_serving_bundle(manifests["v1"])
+    X = np.random.default_rng(0).uniform(0.0, 1.0, (64, len(DEFAULT_GRID)))
+    for key in ("threat_model", "crowd_model"):
+        np.testing.assert_array_equal(reloaded[key].predict(X), predictor._BUNDLE[key].predict(X))
@@ -0,0 +1,82 @@
+"""HTTP behaviour of the scenario API against an empty, throwaway database."""
+
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.api.playback import playback_sessions
+from app.api.routes import playback_events, router
+from app.db.models import Base
+from app.db.session import get_db_session
+
+SCENARIO_ID = "scenario_a_normal_exit"
+
+
+@pytest.fixture
+def client(tmp_path) -> TestClient:
+    """The API router on a fresh SQLite file, so every scenario is served synthetically."""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}", poolclass=NullPool)
+
+    async def create_tables() -> None:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+    asyncio.run(create_tables())
+    sessions = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    async def db_session():
+        async with sessions() as session:
+            yield session
+
+    app = FastAPI()
+    app.include_router(router, prefix="/api")
+    app.dependency_overrides[get_db_session] = db_session
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.mark.parametrize("mode", ["analytic", "sampled"])
+def test_surge_envelope_p0(client: TestClient, mode: str) -> None:
+    response = client.get(
+        f"/api/scenarios/{SCENARIO_ID}/surge-envelope",
+        params={"mode": mode, "quantiles": "0", "num_simulations": 1_000, "start": 1_100, "end": 1_110},
+    )
+    assert response.status_code == 200
+    envelope = response.json()["envelope"]
+    assert all(frame["p0"] >= 0.0 for frame in envelope)
+    if mode == "analytic":
+        assert all(frame["p0"] == 0.0 for frame in envelope)
+
+
+def test_surge_envelope_p100(client: TestClient) -> None:
+    path = f"/api/scenarios/{SCENARIO_ID}/surge-envelope"
+    params = {"quantiles": "100", "num_simulations": 1_000, "start": 1_100, "end": 1_110}
+    assert client.get(path, params={**params, "mode": "sampled"}).status_code == 200
+    response = client.get(path, params={**params, "mode": "analytic"})
+    assert response.status_code == 400
+    assert "below 100" in response.json()["detail"]
+
+
+def test_unread_playback_stream_does_not_pin_session() -> None:
+    """A client gone before the first SSE chunk must not keep the session registered."""
+
+    async def scenario() -> None:
+        frames = [{"minute": minute} for minute in range(5)]
+        session = playback_sessions.create(SCENARIO_ID, frames, speed=60_000.0, start_minute=0, loop=False)
+        response = await playback_events(session.session_id)
+        assert session.describe()["subscribers"] == 0
+        await session.stop()
+        assert playback_sessions.get(session.session_id) is None
+        del response
+
+        session = playback_sessions.create(SCENARIO_ID, frames, speed=60_000.0, start_minute=0, loop=False)
+        response = await playback_events(session.session_id)
+        chunks = [chunk async for chunk in response.body_iterator]
+        assert chunks[-1].startswith(b"event: end")
+        assert playback_sessions.get(session.session_id) is None
+
+    asyncio.run(scenario())
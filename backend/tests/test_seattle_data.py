@@ -0,0 +1,133 @@
+"""The vectorised transit matrices match the scalar per-minute model exactly."""
+
+import asyncio
+
+import numpy as np
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.db.models import Base, TransitCache
+from app.etl import seattle_data
+from app.etl.seattle_data import (
+    CORRIDORS,
+    SCENARIO_PROFILES,
+    _bulk_load_transit_cache,
+    _event_multiplier,
+    build_event_multipliers,
+    build_transit_matrices,
+)
+
+# What-if profiles on top of the shipped scenarios: odd decay lengths, an
+# early exit during the settle window and one before kickoff.
+WHAT_IF_PROFILES = {
+    "what_if_long_decay": {
+        "pregame_peak": 2.5, "during_game": 0.7, "postgame_peak": 5.0,
+        "postgame_decay": 97, "early_exit": None,
+    },
+    "what_if_exit_in_settle": {
+        "pregame_peak": 4.0, "during_game": 0.3, "postgame_peak": 8.0,
+        "postgame_decay": 33, "early_exit": seattle_data.GAME_START + 7,
+    },
+    "what_if_exit_before_kickoff": {
+        "pregame_peak": 1.5, "during_game": 1.2, "postgame_peak": 2.0,
+        "postgame_decay": 10, "early_exit": seattle_data.GAME_START - 15,
+    },
+}
+
+
+def _random_corridors(n: int, seed: int) -> dict[str, dict]:
+    rng = np.random.default_rng(seed)
+    return {
+        f"corridor_{i}": {
+            "awdt": float(rng.integers(1_000, 80_000)),
+            "ped_ratio": float(rng.uniform(0.01, 0.5)),
+            "proximity": float(rng.choice([0.0, 1.0, rng.uniform()])),
+        }
+        for i in range(n)
+    }
+
+
+def _random_profile(seed: int) -> np.ndarray:
+    profile = np.random.default_rng(seed).uniform(0.5, 2.0, 1440)
+    return profile / profile.sum()
+
+
+def _scalar_matrices(
+    scenario_ids: list[str], profile: np.ndarray, corridors: dict[str, dict]
+) -> tuple[np.ndarray, np.ndarray]:
+    """The original per-cell loop from ``_build_scenario_rows``."""
+    shape = (len(scenario_ids), 1440, len(corridors))
+    transit_load = np.empty(shape, dtype=np.int64)
+    pedestrian_volume = np.empty(shape, dtype=np.int64)
+    for s, scenario_id in enumerate(scenario_ids):
+        cfg = seattle_data.SCENARIO_PROFILES[scenario_id]
+        for c, corridor in enumerate(corridors.values()):
+            for minute in range(1440):
+                base = corridor["awdt"] * profile[minute]
+                mult = _event_multiplier(minute, cfg, corridor["proximity"])
+                transit_load[s, minute, c] = max(1, int(base * mult))
+                pedestrian_volume[s, minute, c] = max(1, int(base * mult * corridor["ped_ratio"]))
+    return transit_load, pedestrian_volume
+
+
+@pytest.fixture
+def scenario_ids(monkeypatch: pytest.MonkeyPatch) -> list[str]:
+    monkeypatch.setattr(seattle_data, "SCENARIO_PROFILES", {**SCENARIO_PROFILES, **WHAT_IF_PROFILES})
+    return [*SCENARIO_PROFILES, *WHAT_IF_PROFILES]
+
+
+def test_event_multipliers_match_scalar(scenario_ids: list[str]) -> None:
+    proximity = np.array([0.0, 0.25, 0.6, 1.0])
+    multipliers = build_event_multipliers(scenario_ids, proximity)
+    expected = np.array([
+        [[_event_multiplier(minute, seattle_data.SCENARIO_PROFILES[sid], p) for p in proximity]
+         for minute in range(1440)]
+        for sid in scenario_ids
+    ])
+    assert multipliers.shape == (len(scenario_ids), 1440, len(proximity))
+    np.testing.assert_array_equal(multipliers, expected)
+
+
+@pytest.mark.parametrize(
+    ("corridors", "profile_seed"),
+    [(CORRIDORS, 0), (_random_corridors(7, seed=1), 2), (_random_corridors(1, seed=3), 4)],
+)
+def test_transit_matrices_match_scalar(
+    scenario_ids: list[str], corridors: dict[str, dict], profile_seed: int
+) -> None:
+    profile = _random_profile(profile_seed)
+    transit_load, pedestrian_volume = build_transit_matrices(scenario_ids, profile, corridors)
+    expected_load, expected_volume = _scalar_matrices(scenario_ids, profile, corridors)
+    np.testing.assert_array_equal(transit_load, expected_load)
+    np.testing.assert_array_equal(pedestrian_volume, expected_volume)
+
+
+def test_bulk_load_restores_sqlite_settings(tmp_path) -> None:
+    pragmas = ("journal_mode", "synchronous", "cache_size", "temp_store")
+    rows = (
+        {"scenario_id": "s", "minute": m, "location_id": "c", "transit_load": m, "pedestrian_volume": 1}
+        for m in range(25_000)
+    )
+
+    async def load() -> tuple[dict, dict, int, str]:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'ingest.db'}", poolclass=NullPool)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with engine.connect() as conn:
+            for pragma in ("synchronous=FULL", "cache_size=-4000", "temp_store=FILE"):
+                await conn.exec_driver_sql(f"PRAGMA {pragma}")
+            read = {name: (await conn.exec_driver_sql(f"PRAGMA {name}")).scalar() for name in pragmas}
+            await _bulk_load_transit_cache(conn, rows)
+            after = {name: (await conn.exec_driver_sql(f"PRAGMA {name}")).scalar() for name in pragmas}
+            count = (await conn.execute(select(func.count()).select_from(TransitCache))).scalar()
+        async with engine.connect() as conn:
+            journal_mode = (await conn.exec_driver_sql("PRAGMA journal_mode")).scalar()
+        await engine.dispose()
+        return read, after, count, journal_mode
+
+    before, after, count, journal_mode = asyncio.run(load())
+    assert count == 25_000
+    assert after == before
+    assert journal_mode == before["journal_mode"] == "delete"
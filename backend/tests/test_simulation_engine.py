@@ -0,0 +1,143 @@
+"""Monte Carlo surge envelopes agree with the closed form within sampling error."""
+
+from dataclasses import replace
+from statistics import NormalDist
+
+import numpy as np
+import pytest
+
+from app.ml.simulation_engine import (
+    SimulationConfig,
+    _replicated_envelope,
+    quantile_key,
+    simulate_surge_envelope,
+    simulate_surge_envelopes,
+    surge_rate_parameters,
+)
+
+NUM_SIMULATIONS = 4_000
+_NORMAL = NormalDist()
+
+
+@pytest.fixture(scope="module")
+def timeline() -> list[dict]:
+    """Three hours: a quiet stretch, a rising game and a Q3 blowout."""
+    frames = []
+    for minute in range(180):
+        frames.append({
+            "egress_threat_score": min(1.0, minute / 120),
+            "estimated_crowd_volume": 0 if minute < 30 else 68_000,
+            "game_state": {"home": 3, "away": 27, "quarter": 3} if minute >= 90 else None,
+        })
+    return frames
+
+
+def monte_carlo_std_errors(timeline: list[dict], cfg: SimulationConfig, analytic: dict) -> dict:
+    """Asymptotic standard error of every envelope statistic for *cfg.num_simulations* draws.
+
+    sqrt(p(1-p)/N) / density for a percentile, sigma/sqrt(N) bounds the
+    mean's, sqrt(p(1-p)/N) a proportion's (plus one count of slack).
+    """
+    _, sigma_rate = surge_rate_parameters(timeline)
+    n = cfg.num_simulations
+    errors = {}
+    for q in cfg.quantiles:
+        p = q / 100.0
+        density = _NORMAL.pdf(_NORMAL.inv_cdf(p)) / sigma_rate
+        errors[quantile_key(q)] = np.sqrt(p * (1.0 - p) / n) / density
+    errors["mean"] = sigma_rate / np.sqrt(n)
+    exceedance = analytic["exceedance_probability"]
+    errors["exceedance_probability"] = np.sqrt(exceedance * (1.0 - exceedance) / n) + 1.0 / n
+    return errors
+
+
+def test_sampled_agrees_with_analytic(timeline: list[dict]) -> None:
+    cfg = SimulationConfig(num_simulations=NUM_SIMULATIONS)
+    analytic = simulate_surge_envelope(timeline, replace(cfg, mode="analytic"))
+    sampled = simulate_surge_envelope(timeline, cfg)
+    for key, std_error in monte_carlo_std_errors(timeline, cfg, analytic).items():
+        diff = np.abs(sampled[key] - analytic[key])
+        assert (diff <= 4.0 * std_error).all(), f"{key}: max |diff| {diff.max():.4f}"
+
+
+def test_parallel_agrees_with_analytic(timeline: list[dict]) -> None:
+    cfg = SimulationConfig(num_simulations=NUM_SIMULATIONS, mode="parallel", workers=1)
+    analytic = simulate_surge_envelope(timeline, replace(cfg, mode="analytic"))
+    parallel = simulate_surge_envelope(timeline, cfg)
+    _, sigma_rate = surge_rate_parameters(timeline)
+    # Percentiles are read from a histogram of 12 sigma over histogram_bins.
+    bin_width = 12.0 * sigma_rate / cfg.histogram_bins
+    for key, std_error in monte_carlo_std_errors(timeline, cfg, analytic).items():
+        tolerance = 4.0 * std_error + (2.0 * bin_width if key.startswith("p") else 0.0)
+        diff = np.abs(parallel[key] - analytic[key])
+        assert (diff <= tolerance).all(), f"{key}: max |diff| {diff.max():.4f}"
+
+
+def test_parallel_is_independent_of_worker_count(timeline: list[dict]) -> None:
+    # One worker ships a histogram; with two or four, each task holds at most
+    # 2,000 draws and ships their bin indices instead.
+    cfg = SimulationConfig(num_simulations=NUM_SIMULATIONS, mode="parallel", workers=1)
+    expected = simulate_surge_envelope(timeline, cfg)
+    for workers in (2, 4):
+        result = simulate_surge_envelope(timeline, replace(cfg, workers=workers))
+        for key in expected:
+            np.testing.assert_array_equal(result[key], expected[key], err_msg=f"{workers} workers, {key}")
+
+    sweep = simulate_surge_envelopes([timeline, timeline[:60], []], replace(cfg, workers=2))
+    for key in expected:
+        np.testing.assert_array_equal(sweep[0][key], expected[key])
+    assert len(sweep[2]["p95"]) == 0
+
+
+@pytest.mark.parametrize("sampling", ["antithetic", "van_der_corput", "latin_hypercube"])
+def test_variance_reduced_p95_and_interval(timeline: list[dict], sampling: str) -> None:
+    cfg = SimulationConfig(num_simulations=1_000, sampling=sampling)
+    exact = simulate_surge_envelope(timeline, replace(cfg, mode="analytic"))["p95"]
+    envelope, draws = _replicated_envelope(*surge_rate_parameters(timeline), cfg)
+    assert (draws == cfg.num_simulations).all()
+
+    # Estimates stay within a few interval half-widths of the exact p95, and
+    # the intervals cover it at about the nominal rate.
+    low, high = envelope["p95_ci_low"], envelope["p95_ci_high"]
+    half_width = (high - low) / 2.0
+    assert (half_width > 0).all()
+    assert (np.abs(envelope["p95"] - exact) <= 4.0 * half_width).all()
+    assert np.mean((low <= exact) & (exact <= high)) >= 0.85
+
+
+def test_random_interval_covers_p95(timeline: list[dict]) -> None:
+    cfg = SimulationConfig(num_simulations=NUM_SIMULATIONS)
+    exact = simulate_surge_envelope(timeline, replace(cfg, mode="analytic"))["p95"]
+    envelope = simulate_surge_envelope(timeline, cfg)
+    assert (envelope["p95_ci_low"] <= envelope["p95"]).all()
+    assert (envelope["p95"] <= envelope["p95_ci_high"]).all()
+    assert np.mean((envelope["p95_ci_low"] <= exact) & (exact <= envelope["p95_ci_high"])) >= 0.85
+
+
+def test_adaptive_stops_at_tolerance_within_budget(timeline: list[dict]) -> None:
+    cfg = SimulationConfig(num_simulations=4_000, sampling="latin_hypercube", ci_tolerance=2.0)
+    envelope, draws = _replicated_envelope(*surge_rate_parameters(timeline), cfg)
+    width = envelope["p95_ci_high"] - envelope["p95_ci_low"]
+    assert (draws >= 4 * cfg.replicate_simulations).all()
+    assert (draws <= cfg.num_simulations).all()
+    assert (width[draws < cfg.num_simulations] <= cfg.ci_tolerance).all()
+    assert draws.mean() < cfg.num_simulations
+
+
+def test_replicated_budget_is_validated() -> None:
+    with pytest.raises(ValueError, match="num_simulations >= 512"):
+        SimulationConfig(num_simulations=500, sampling="latin_hypercube")
+    with pytest.raises(ValueError, match="ci_tolerance"):
+        SimulationConfig(num_simulations=100, ci_tolerance=1.0)
+    SimulationConfig(num_simulations=100, sampling="latin_hypercube", mode="analytic")
+
+
+def test_quantile_endpoints(timeline: list[dict]) -> None:
+    cfg = SimulationConfig(num_simulations=NUM_SIMULATIONS, quantiles=(0.0, 100.0))
+    sampled = simulate_surge_envelope(timeline, cfg)
+    assert (sampled["p0"] >= 0.0).all()
+    assert (sampled["p100"] >= sampled["p0"]).all()
+    analytic = simulate_surge_envelope(timeline, replace(cfg, mode="analytic", quantiles=(0.0,)))
+    assert (analytic["p0"] == 0.0).all()
+    with pytest.raises(ValueError, match="below 100"):
+        replace(cfg, mode="analytic")
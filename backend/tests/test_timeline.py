@@ -0,0 +1,63 @@
+"""Columnar dictionaries depend only on the decoded timeline, not on its source."""
+
+import json
+from types import SimpleNamespace
+
+from app.api.timeline import (
+    LOCK_DOWN_FIELDS,
+    TimelineRows,
+    assemble_columnar,
+    assemble_frames,
+    dictionary_encode,
+    frames_to_columnar,
+    generate_synthetic_timeline,
+    lock_down_value,
+    parse_routes,
+)
+from app.etl.scenarios import get_scenario
+
+ROUTE = [[-122.33, 47.59], [-122.32, 47.60]]
+
+
+def test_routes_that_parse_equal_share_a_code() -> None:
+    raw = [None, "[]", "not json", json.dumps([ROUTE]), json.dumps([{"path": ROUTE}])]
+    codes, distinct = dictionary_encode(raw, parse_routes)
+    assert codes == [0, 0, 0, 1, 1]
+    assert distinct == [[], [ROUTE]]
+
+
+def test_db_rows_and_frames_share_dictionaries() -> None:
+    routes = [None, "[]", "{bad", json.dumps([ROUTE])]
+    predictions, routing = [], []
+    for minute in range(20):
+        threat = 0.95 if 5 <= minute < 9 else 0.2
+        predictions.append(SimpleNamespace(
+            minute=minute,
+            egress_threat_score=threat,
+            estimated_crowd_volume=30_000,
+            game_state={"home": 7, "away": minute // 5, "quarter": 2},
+        ))
+        if minute % 3:
+            routing.append(SimpleNamespace(
+                minute=minute,
+                danger_routes=routes[minute % len(routes)],
+                safe_routes=routes[(minute + 1) % len(routes)],
+                alert_message="ok" if threat < 0.9 else "lock",
+                severity=1,
+            ))
+    rows = TimelineRows(0, 20, predictions, routing, [])
+
+    from_rows = assemble_columnar(rows, None)
+    from_frames = frames_to_columnar(assemble_frames(rows, None), 0, 20, None)
+    assert from_rows["dictionaries"] == from_frames["dictionaries"]
+    assert from_rows["columns"] == from_frames["columns"]
+
+
+def test_synthetic_lock_down_codes_are_fixed() -> None:
+    scenario_id = "scenario_a_normal_exit"
+    frames = generate_synthetic_timeline(scenario_id, get_scenario(scenario_id), 0, 1_440, None)
+    payload = frames_to_columnar(frames, 0, 1_440, None)
+    for name in LOCK_DOWN_FIELDS:
+        dictionary = [lock_down_value(name, False), lock_down_value(name, True)]
+        assert payload["dictionaries"][name] == dictionary
+        assert [dictionary[code] for code in payload["columns"][name]] == [frame[name] for frame in frames]
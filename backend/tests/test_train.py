@@ -0,0 +1,125 @@
+"""Vectorised training labels and features match the row-wise scalar functions."""
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.metrics import r2_score
+from sklearn.model_selection import KFold
+from xgboost import XGBRegressor
+
+from app.ml import train
+from app.ml.features import GAME_FEATURES, make_feature_vector
+from app.ml.train import _heuristic_threat, _heuristic_threat_batch
+
+# Edges of every branch in _heuristic_threat: quarter 3 and overtime, the
+# 45/30-minute suppression cut-offs, end of game, and score_diff at -14/-35.
+EDGE_QUARTERS = [1.0, 2.0, 3.0, 4.0, 5.0]
+EDGE_MINUTES = [0.0, 0.5, 29.999, 30.0, 30.001, 44.999, 45.0, 45.001, 59.0, 60.0]
+EDGE_DIFFS = [-50.0, -35.0, -34.0, -14.0, -13.0, 0.0, 14.0, 28.0, 42.0]
+
+
+def _synthetic_plays(n: int = 2_000, seed: int = 0) -> pd.DataFrame:
+    """Plays shaped like the NFL CSV, already in build_training_data's order."""
+    rng = np.random.default_rng(seed)
+    game_id = np.sort(rng.integers(1, 20, n))
+    qtr = rng.choice([1, 2, 3, 4, 5], n).astype(np.float64)
+    # Quarter clocks including the exact quarter edges.
+    clock = rng.choice([0.0, 1.0, 450.0, 899.0, 900.0, *rng.integers(0, 901, 8).tolist()], n)
+    game_secs = np.where(qtr == 5, clock * 600 / 900, (4 - qtr) * 900 + clock)
+    home = rng.integers(0, 50, n).astype(np.float64)
+    away = rng.integers(0, 50, n).astype(np.float64)
+    home[rng.random(n) < 0.02] = np.nan
+    away[rng.random(n) < 0.02] = np.nan
+    plays = pd.DataFrame({
+        "game_id": game_id,
+        "qtr": qtr,
+        "game_seconds_remaining": game_secs,
+        "total_home_score": home,
+        "total_away_score": away,
+    })
+    return plays.sort_values(
+        ["game_id", "game_seconds_remaining"], ascending=[True, False], kind="stable"
+    ).reset_index(drop=True)
+
+
+def test_heuristic_threat_batch_matches_scalar_on_edges() -> None:
+    grid = np.array(np.meshgrid(EDGE_DIFFS, EDGE_MINUTES, EDGE_QUARTERS, indexing="ij")).reshape(3, -1)
+    score_diff, minutes_remaining, quarter = grid
+    expected = [
+        _heuristic_threat(sd, mr, q)
+        for sd, mr, q in zip(score_diff.tolist(), minutes_remaining.tolist(), quarter.tolist())
+    ]
+    np.testing.assert_array_equal(
+        _heuristic_threat_batch(score_diff, minutes_remaining, quarter), np.array(expected)
+    )
+
+
+def test_build_training_data_matches_row_wise(monkeypatch: pytest.MonkeyPatch, tmp_path) -> None:
+    plays = _synthetic_plays()
+    dropped = pd.DataFrame({
+        "game_id": [99, 99, 99],
+        "qtr": [np.nan, 6.0, 2.0],
+        "game_seconds_remaining": [100.0, 100.0, np.nan],
+        "total_home_score": [0.0, 0.0, 0.0],
+        "total_away_score": [0.0, 0.0, 0.0],
+    })
+    monkeypatch.setattr(train, "ensure_nfl_store", lambda path: {"sha256": "test"})
+    monkeypatch.setattr(train, "load_games", lambda path, columns: pd.concat([plays, dropped]))
+    monkeypatch.setattr(train, "TRAINING_CACHE_PATH", tmp_path / "training_data.npz")
+
+    training_df = train.build_training_data(use_cache=False)
+    assert len(training_df) == len(plays)
+
+    features, threat = [], []
+    for row in plays.itertuples(index=False):
+        home = 0.0 if np.isnan(row.total_home_score) else row.total_home_score
+        away = 0.0 if np.isnan(row.total_away_score) else row.total_away_score
+        vector = make_feature_vector({
+            "quarter": row.qtr,
+            "clock_seconds_remaining": row.game_seconds_remaining - (4 - row.qtr) * 900,
+            "home": home,
+            "away": away,
+        })
+        features.append([vector[name] for name in GAME_FEATURES])
+        threat.append(
+            _heuristic_threat(home - away, max(0.0, row.game_seconds_remaining / 60.0), row.qtr)
+        )
+
+    # Training features are stored as float32.
+    np.testing.assert_array_equal(
+        training_df[list(GAME_FEATURES)].to_numpy(), np.array(features, dtype=np.float32)
+    )
+    np.testing.assert_array_equal(training_df["threat_label"].to_numpy(), np.array(threat))
+    np.testing.assert_array_equal(
+        training_df["crowd_label"].to_numpy(),
+        np.array([int(t * train.STADIUM_CAPACITY) for t in threat]),
+    )
+
+
+def test_randomized_search_scores_with_sample_weight(monkeypatch: pytest.MonkeyPatch) -> None:
+    rng = np.random.default_rng(0)
+    X = rng.random((300, 3))
+    y = X @ np.array([1.0, 2.0, 3.0]) + rng.normal(0.0, 0.3, 300)
+    weights = rng.integers(1, 50, 300).astype(np.float64)
+    searches = []
+
+    class RecordingSearch(train.RandomizedSearchCV):
+        def fit(self, *args, **kwargs):
+            searches.append(self)
+            return super().fit(*args, **kwargs)
+
+    monkeypatch.setattr(train, "RandomizedSearchCV", RecordingSearch)
+    monkeypatch.setattr(train, "_PARAM_GRID", {"n_estimators": [10, 20], "max_depth": [2]})
+    monkeypatch.setattr(train, "_N_ITER", 2)
+    train._randomized_search(X, y, random_state=0, sample_weight=weights)
+
+    results = searches[0].cv_results_
+    for params, score in zip(results["params"], results["mean_test_score"]):
+        fold_scores = []
+        for fit_idx, val_idx in KFold(train._CV).split(X):
+            model = XGBRegressor(random_state=42, verbosity=0, **params)
+            model.fit(X[fit_idx], y[fit_idx], sample_weight=weights[fit_idx])
+            fold_scores.append(
+                r2_score(y[val_idx], model.predict(X[val_idx]), sample_weight=weights[val_idx])
+            )
+        assert score == pytest.approx(np.mean(fold_scores), rel=1e-6)